@@ -0,0 +1,27 @@
+import random
+
+
+class ScriptedBot:
+    # deterministic JSON commands for a seed: changes direction now and then, shoots at random points,
+    # dashes and picks weapons rarely. The commands don't depend on the game state
+    def __init__(self, seed: int, arena_width: float, arena_height: float, shot_probability: float = 0.5):
+        self.random = random.Random(seed)
+        self.arena_width = arena_width
+        self.arena_height = arena_height
+        self.shot_probability = shot_probability
+        self.direction = (1.0, 0.0)
+
+    def command(self) -> dict:
+        if self.random.random() < 0.1:
+            self.direction = (self.random.uniform(-1, 1), self.random.uniform(-1, 1))
+
+        command = {'move': {'direction_x': self.direction[0], 'direction_y': self.direction[1]}}
+        if self.random.random() < self.shot_probability:
+            command['shot'] = {'point_x': self.random.uniform(0, self.arena_width),
+                               'point_y': self.random.uniform(0, self.arena_height)}
+        if self.random.random() < 0.2:
+            command['pick_weapon'] = True
+        if self.random.random() < 0.02:
+            command['dash'] = True
+
+        return command
@@ -0,0 +1,76 @@
+import argparse
+import shlex
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+# pass-through benchmark of the tcp_client.py proxy: a fake server sends a state of the given size,
+# the strategy behind the proxy answers every state right away and the server waits for the answer
+ECHO_STRATEGY = shlex.join([sys.executable, '-c', (
+    'import sys\n'
+    'sys.stdin.buffer.readline()\n'
+    'for _ in sys.stdin.buffer:\n'
+    '    sys.stdout.buffer.write(b"{}\\n")\n'
+    '    sys.stdout.buffer.flush()\n'
+)])
+WARMUP_TICKS = 20
+
+
+def run_proxy(proxy: str, size: int, ticks: int) -> float:
+    # seconds per tick of a round trip through the proxy
+    server = socket.create_server(('127.0.0.1', 0))
+    port = server.getsockname()[1]
+    path, *proxy_args = shlex.split(proxy)
+    process = subprocess.Popen([sys.executable, path, '--host', '127.0.0.1', '--port', str(port),
+                                '--strategy', ECHO_STRATEGY, *proxy_args])
+    conn, _ = server.accept()
+    server.close()
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    commands = conn.makefile('rb')
+
+    state = b'"' + b'x' * max(size - 3, 0) + b'"\n'
+    conn.sendall(b'{}\n')
+    try:
+        for _ in range(WARMUP_TICKS):
+            conn.sendall(state)
+            commands.readline()
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            conn.sendall(state)
+            commands.readline()
+        return (time.perf_counter() - start) / ticks
+    finally:
+        commands.close()
+        conn.close()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    default_proxy = str(Path(__file__).resolve().parent.parent / 'tcp_client.py')
+    parser.add_argument('--proxy', action='append',
+                        help='Proxy script with its extra arguments, can be repeated to compare proxies')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[256, 64 * 1024, 1024 * 1024],
+                        help='State sizes in bytes')
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--bytes-budget', type=int, default=512 * 1024 * 1024,
+                        help='Big states run fewer ticks, so that a run sends about this many bytes')
+    args = parser.parse_args()
+    proxies = args.proxy or [default_proxy, f'{default_proxy} --no-splice']
+
+    print(f'{"proxy":<50} {"state":>10} {"ticks":>7} {"us/tick":>10} {"MB/s":>10}')
+    for proxy in proxies:
+        for size in args.sizes:
+            ticks = max(WARMUP_TICKS, min(args.ticks, args.bytes_budget // size))
+            per_tick = run_proxy(proxy, size, ticks)
+            name = proxy if len(proxy) <= 50 else '...' + proxy[-47:]
+            print(f'{name:<50} {size:>10} {ticks:>7} {per_tick * 1e6:>10.1f} {size / per_tick / 1e6:>10.1f}',
+                  flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+from pathlib import Path
+from time import perf_counter_ns
+
+from benchmarks.bots import ScriptedBot
+from clients import Client
+from config import GameConfig
+from game.chainsaw import Chainsaw
+from game.game import Game
+from game.game_loop import GameLoop
+from game.state_serializer import StateSerializer
+from game.utils import Vec
+from parsing import CommandParser, parse_command
+
+
+# deterministic micro and end-to-end benchmarks, run from the repository root:
+#     python -m benchmarks.suite --output results.json
+#     python -m benchmarks.suite --compare results.json
+# every case returns (elapsed ns, operations), the reported value is the median ns per operation of the repeats
+BASE_CONFIG = Path(__file__).resolve().parent.parent / 'configs' / 'config.json'
+SEED = 1
+WARMUP_TICKS = 200
+
+
+def make_config(players: int = 2, chainsaws: int = 4, shot_timeout: int = None, max_ticks: int = 2000000) -> GameConfig:
+    raw = json.loads(BASE_CONFIG.read_text())
+    raw['restrictions']['max_ticks'] = max_ticks
+    width, height = raw['arena']['width'], raw['arena']['height']
+
+    # spawns on a circle around the center, chainsaws go around squares spread over the arena
+    raw['players']['spawns'] = [
+        {'id': index, 'position': {'x': width / 2 + width * 0.4 * math.cos(2 * math.pi * index / players),
+                                   'y': height / 2 + height * 0.4 * math.sin(2 * math.pi * index / players)}}
+        for index in range(players)
+    ]
+    rng = random.Random(SEED)
+    raw['chainsaws'] = []
+    for _ in range(chainsaws):
+        x, y = rng.uniform(64, width - 128), rng.uniform(64, height - 128)
+        raw['chainsaws'].append({'radius': 32, 'speed': 4, 'path': [
+            {'x': x, 'y': y}, {'x': x + 64, 'y': y}, {'x': x + 64, 'y': y + 64}, {'x': x, 'y': y + 64}]})
+
+    if shot_timeout is not None:
+        for weapon in ('pistol', 'shotgun', 'sniper_rifle'):
+            raw['items']['weapons'][weapon]['shot_timeout'] = shot_timeout
+
+    return GameConfig(**raw)
+
+
+def make_bots(game_config: GameConfig, shot_probability: float = 0.5) -> list[ScriptedBot]:
+    return [ScriptedBot(SEED + spawn.id, game_config.arena.width, game_config.arena.height, shot_probability)
+            for spawn in game_config.players.spawns]
+
+
+def play_ticks(game: Game, bots: list[ScriptedBot], ticks: int) -> int:
+    # ns spent in Game.tick only, commands are built and parsed outside of the measurement
+    elapsed = 0
+    for _ in range(ticks):
+        commands = [parse_command(game, player.id, bot.command()) for player, bot in zip(game.players, bots)]
+        start = perf_counter_ns()
+        game.tick(commands)
+        elapsed += perf_counter_ns() - start
+    return elapsed
+
+
+def warm_game(game_config: GameConfig, shot_probability: float = 0.5) -> tuple[Game, list[ScriptedBot]]:
+    game = Game(game_config, seed=SEED)
+    bots = make_bots(game_config, shot_probability)
+    play_ticks(game, bots, WARMUP_TICKS)
+    return game, bots
+
+
+def tick_case(players: int, chainsaws: int, shot_timeout: int = None, ticks: int = 500):
+    # a short shot timeout comes with bots shooting every tick, so that bullets pile up
+    shot_probability = 0.5 if shot_timeout is None else 1.0
+
+    def run():
+        game, bots = warm_game(make_config(players, chainsaws, shot_timeout), shot_probability)
+        return play_ticks(game, bots, ticks), ticks
+    return run
+
+
+def state_case(serialize, players: int = 8, shot_timeout: int = 2, calls: int = 300):
+    def run():
+        game, _ = warm_game(make_config(players, 4, shot_timeout), shot_probability=1.0)
+        start = perf_counter_ns()
+        for _ in range(calls):
+            serialize(game)
+        return perf_counter_ns() - start, calls
+    return run
+
+
+def get_state_json(game: Game):
+    return json.dumps(game.get_state())
+
+
+def parse_case(commands: list, calls: int = 20000):
+    def run():
+        game = Game(make_config(), seed=SEED)
+        start = perf_counter_ns()
+        for index in range(calls):
+            parse_command(game, index & 1, commands[index % len(commands)])
+        return perf_counter_ns() - start, calls
+    return run
+
+
+def compiled_parse_case(commands: list, calls: int = 20000):
+    def run():
+        game = Game(make_config(), seed=SEED)
+        parse = CommandParser(game).parse
+        start = perf_counter_ns()
+        for index in range(calls):
+            parse(index & 1, commands[index % len(commands)])
+        return perf_counter_ns() - start, calls
+    return run
+
+
+def batch_parse_case(players: int = 32, ticks: int = 1000):
+    # commands of all players for a tick at once, ns per command
+    def run():
+        game_config = make_config(players)
+        game = Game(game_config, seed=SEED)
+        parser = CommandParser(game)
+        bots = make_bots(game_config)
+        batches = [[(player.id, bot.command()) for player, bot in zip(game.players, bots)] for _ in range(ticks)]
+        start = perf_counter_ns()
+        for batch in batches:
+            parser.parse_commands(batch)
+        return perf_counter_ns() - start, ticks * players
+    return run
+
+
+VALID_COMMANDS = [
+    {'move': {'direction_x': 0.5, 'direction_y': -0.5}, 'shot': {'point_x': 100.0, 'point_y': 200.0},
+     'pick_weapon': True, 'dash': True},
+    {'move': {'direction_x': -1, 'direction_y': 0}, 'shot': {'point_x': 650, 'point_y': 20},
+     'pick_weapon': True, 'dash': True},
+]
+PARTIAL_COMMANDS = [
+    {'move': {'direction_x': 0.5, 'direction_y': -0.5}},
+    {'shot': {'point_x': 100.0, 'point_y': 200.0}},
+    {},
+]
+GARBAGE_COMMANDS = [
+    {'move': 'left', 'shot': {'point_x': 'a', 'point_y': None}, 'pick_weapon': 1, 'dash': 'yes'},
+    {'move': {'direction_x': 1}, 'shot': {'point_x': -5, 'point_y': 10000}, 'extra': []},
+    [1, 2, 3],
+    'garbage',
+]
+
+
+def chainsaw_case(moves: int = 50000):
+    def run():
+        chainsaw = Chainsaw(32, 4, [Vec(128, 256), Vec(256, 128), Vec(400, 300), Vec(200, 500)])
+        start = perf_counter_ns()
+        for _ in range(moves):
+            chainsaw.move()
+        return perf_counter_ns() - start, moves
+    return run
+
+
+class FakeClient(Client):
+    # in-memory client: keeps the last message and answers with the commands of a scripted bot
+    def __init__(self, bot: ScriptedBot):
+        self.bot = bot
+        self.last_message = None
+
+    async def send_message(self, msg):
+        self.last_message = msg
+
+    async def get_command(self):
+        return self.bot.command()
+
+    def disconnect(self):
+        pass
+
+
+def game_loop_case(players: int = 4, ticks: int = 1000):
+    def run():
+        game_config = make_config(players, max_ticks=ticks)
+        game = Game(game_config, seed=SEED)
+        clients = [FakeClient(bot) for bot in make_bots(game_config)]
+        # GameLoop shuffles the clients with the global generator
+        random.seed(SEED)
+        game_loop = GameLoop(game, clients)
+        start = perf_counter_ns()
+        asyncio.run(game_loop.play())
+        return perf_counter_ns() - start, ticks
+    return run
+
+
+CASES = {
+    'tick/2p-4saws': tick_case(2, 4),
+    'tick/8p-4saws': tick_case(8, 4),
+    'tick/32p-4saws': tick_case(32, 4, ticks=200),
+    'tick/8p-32saws': tick_case(8, 32),
+    'tick/8p-4saws-bullets': tick_case(8, 4, shot_timeout=2),
+    'tick/32p-4saws-bullets': tick_case(32, 4, shot_timeout=2, ticks=100),
+    'state/get_state+json.dumps': state_case(get_state_json),
+    'state/serializer': state_case(StateSerializer().serialize),
+    'parse/valid': parse_case(VALID_COMMANDS),
+    'parse/partial': parse_case(PARTIAL_COMMANDS),
+    'parse/garbage': parse_case(GARBAGE_COMMANDS),
+    'parse-compiled/valid': compiled_parse_case(VALID_COMMANDS),
+    'parse-compiled/partial': compiled_parse_case(PARTIAL_COMMANDS),
+    'parse-compiled/garbage': compiled_parse_case(GARBAGE_COMMANDS),
+    'parse-compiled/batch-32p': batch_parse_case(),
+    'chainsaw/move': chainsaw_case(),
+    'game_loop/play-4p': game_loop_case(),
+}
+
+
+def run_cases(names: list[str], repeats: int) -> dict:
+    results = {}
+    for name in names:
+        per_op = []
+        for _ in range(repeats):
+            elapsed, ops = CASES[name]()
+            per_op.append(elapsed / ops)
+        results[name] = {'ns_per_op': statistics.median(per_op), 'min_ns_per_op': min(per_op), 'repeats': repeats}
+        print(f'{name:<32} {results[name]["ns_per_op"]:>14.1f} ns/op', flush=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    # True if some case got slower than the baseline by more than threshold
+    regressed = False
+    print(f'\n{"case":<32} {"baseline":>14} {"current":>14} {"change":>8}')
+    for name, result in results.items():
+        if name not in baseline:
+            print(f'{name:<32} {"-":>14} {result["ns_per_op"]:>14.1f}')
+            continue
+
+        before = baseline[name]['ns_per_op']
+        change = result['ns_per_op'] / before - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        print(f'{name:<32} {before:>14.1f} {result["ns_per_op"]:>14.1f} {change:>+8.1%}{flag}')
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filter', type=str, default='', help='Run only cases containing this substring')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON')
+    parser.add_argument('--compare', type=str, default=None, metavar='BASELINE',
+                        help='Results JSON to compare with, exits with 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative slowdown treated as a regression')
+    args = parser.parse_args()
+
+    names = [name for name in CASES if args.filter in name]
+    results = run_cases(names, args.repeats)
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump({'python': sys.version, 'platform': platform.platform(), 'results': results}, file, indent=1)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
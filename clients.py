@@ -1,11 +1,58 @@
+import asyncio
+import importlib
 import json
-import config
+import os
+import signal
+import socket
+from config import GameConfig
+from game.binary_codec import FRAME, COMMAND, decode_command
+from game.shm_channel import Channel
+from parsing import InvalidAction, Move, Dash, Shot, Boolean
+
+
+READ_CHUNK_SIZE = 64 * 1024
+# below this many unsent bytes messages are just queued to the transport without waiting for the peer
+WRITE_HIGH_WATER = 64 * 1024
+# commands ring of a shared memory client, its states ring takes restrictions.send_buffer_limit bytes
+SHM_COMMANDS_CAPACITY = 64 * 1024
+# exact classes of the (move, dash, shot, pick_weapon) actions of an in-process strategy
+ACTION_TYPES = (Move, Dash, Shot, Boolean)
+# seconds a terminated strategy has to exit before its process group is killed
+TERMINATE_TIMEOUT = 2.0
+TERMINATE_POLL_INTERVAL = 0.05
+
+
+class MessageTooLarge(Exception):
+    pass
+
+
+class SlowConsumer(Exception):
+    pass
+
+
+def encode_message(msg) -> list[bytes]:
+    # text messages are newline terminated, binary ones are length-prefixed.
+    # parts are passed to writelines, so the payload isn't copied to glue the frame
+    if isinstance(msg, bytes):
+        return [FRAME.pack(len(msg)), msg]
+
+    return [msg.encode(), b'\n']
 
 
 class Client:
+    # serialized clients get JSON messages and send JSON commands that have to be parsed
+    serialized = True
+    # set by GameLoop, in binary encoding states are framed bytes and commands are fixed records
+    state_encoding = 'full'
+    # bytes of the last received command
+    command_size = 0
+
     async def connect(self):
         raise NotImplemented
 
+    def config_message(self, config_json: dict) -> str:
+        return json.dumps(config_json)
+
     async def send_message(self, msg):
         raise NotImplemented
 
@@ -16,38 +63,329 @@ class Client:
         raise NotImplemented
 
 
-class ProcessClient(Client):
-    def __init__(self, process):
-        self.process = process
+class StreamClient(Client):
+    # client that receives messages through an asyncio stream writer
+    def __init__(self, writer, game_config: GameConfig):
+        self.writer = writer
+        self.send_buffer_limit = game_config.restrictions.send_buffer_limit
+        self.peak_buffered_bytes = 0
+        # drain only waits while the transport is paused, that is above the high-water mark
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+
+    def buffered_bytes(self) -> int:
+        # bytes written but not yet accepted by the kernel
+        return self.writer.transport.get_write_buffer_size()
 
     async def send_message(self, msg):
-        self.process.stdin.write((msg+'\n').encode())
-        await self.process.stdin.drain()
+        self.writer.writelines(encode_message(msg))
+
+        buffered = self.buffered_bytes()
+        self.peak_buffered_bytes = max(self.peak_buffered_bytes, buffered)
+        if buffered > self.send_buffer_limit:
+            # unsent states of a client that doesn't read them are dropped instead of kept until close
+            self.writer.transport.abort()
+            raise SlowConsumer(f'{buffered} unsent bytes, the limit is {self.send_buffer_limit}')
+
+        # a consumer that doesn't catch up within the response timeout is disconnected by the game loop
+        if buffered > WRITE_HIGH_WATER:
+            await self.writer.drain()
+
+
+class ProcessClient(StreamClient):
+    def __init__(self, process, game_config: GameConfig):
+        super().__init__(process.stdin, game_config)
+        self.process = process
+        # matches finished by a warm process of a ProcessPool
+        self.games_played = 0
+
+    def config_message(self, config_json: dict) -> str:
+        # a warm process expects a state, the following game starts with a new game message in its place
+        if self.games_played:
+            return json.dumps({'new_game': config_json})
+        return super().config_message(config_json)
 
     async def get_command(self):
+        if self.state_encoding == 'binary':
+            self.command_size = COMMAND.size
+            return decode_command(await self.process.stdout.readexactly(COMMAND.size))
+
         command = await self.process.stdout.readline()
+        self.command_size = len(command)
         return json.loads(command)
 
     def disconnect(self):
-        # there are cases when process terminates before server command to disconnect
-        try:
-            self.process.terminate()
-        except ProcessLookupError:
-            pass
+        terminate_process(self.process)
+
+
+def terminate_process(process):
+    # there are cases when process terminates before server command to disconnect
+    # strategy runs in its own session, so the whole group is terminated and not only the shell
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+def group_alive(pgid: int) -> bool:
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+async def reap_process(process):
+    # waits for a terminated strategy. The shell may exit on SIGTERM while the strategy it started
+    # ignores it, so the whole group is killed if anything in it is alive after TERMINATE_TIMEOUT
+    deadline = asyncio.get_running_loop().time() + TERMINATE_TIMEOUT
+    try:
+        await asyncio.wait_for(process.wait(), timeout=TERMINATE_TIMEOUT)
+    except asyncio.TimeoutError:
+        pass
+
+    while group_alive(process.pid) and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(TERMINATE_POLL_INTERVAL)
+
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await process.wait()
+
 
+class ShmClient(Client):
+    # local strategy exchanging messages with the runner through a shared memory channel, see game/shm_channel.py
+    def __init__(self, process, channel: Channel, game_config: GameConfig):
+        self.process = process
+        self.channel = channel
+        self.command_size_limit = game_config.restrictions.command_size_limit
+        self.ready = asyncio.Event()
+        self.exited = False
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(channel.commands_signal.wait_fd, self.on_signal)
+        self.exit_watcher = self.loop.create_task(self.watch_exit())
+
+    def on_signal(self):
+        self.channel.collect_signals()
+        self.ready.set()
+
+    async def watch_exit(self):
+        await self.process.wait()
+        # commands written right before the exit are still counted
+        self.channel.collect_signals()
+        self.exited = True
+        self.ready.set()
+
+    async def send_message(self, msg):
+        self.channel.send(msg if isinstance(msg, bytes) else msg.encode())
 
-class TCPClient(Client):
-    def __init__(self, reader, writer):
+    async def get_command(self):
+        while True:
+            self.ready.clear()
+            command = self.channel.receive()
+            if command is not None:
+                break
+            if self.exited:
+                raise ConnectionError('Strategy process exited')
+            await self.ready.wait()
+
+        self.command_size = len(command)
+        if len(command) > self.command_size_limit:
+            raise MessageTooLarge(f'Command is longer than {self.command_size_limit} bytes')
+        if self.state_encoding == 'binary':
+            return decode_command(command)
+        return json.loads(command)
+
+    def disconnect(self):
+        self.loop.remove_reader(self.channel.commands_signal.wait_fd)
+        self.exit_watcher.cancel()
+        terminate_process(self.process)
+        self.channel.close()
+
+
+class TCPClient(StreamClient):
+    def __init__(self, reader, writer, game_config: GameConfig):
+        super().__init__(writer, game_config)
         self.reader = reader
-        self.writer = writer
+        # states are sent as soon as they are written, Nagle's algorithm would hold them for an ACK
+        sock = writer.get_extra_info('socket')
+        if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.command_size_limit = game_config.restrictions.command_size_limit
+        # received bytes that are not consumed yet, reused for all commands of the client
+        self.buffer = bytearray()
+        # prefix of the buffer already known to have no line end
+        self.scanned = 0
+
+    async def get_command(self):
+        if self.state_encoding == 'binary':
+            self.command_size = COMMAND.size
+            return decode_command(await self.reader.readexactly(COMMAND.size))
+
+        line = await self.read_line()
+        self.command_size = len(line)
+        return json.loads(line)
+
+    async def read_line(self) -> bytes:
+        # commands are newline terminated, one read may hold a part of a command or several of them.
+        # the buffer grows by chunks and never beyond the command size limit plus the line end
+        while True:
+            end = self.buffer.find(b'\n', self.scanned)
+            if end != -1:
+                line = bytes(self.buffer[:end])
+                del self.buffer[:end + 1]
+                self.scanned = 0
+                return line
+
+            self.scanned = len(self.buffer)
+            free = self.command_size_limit + 1 - len(self.buffer)
+            if free <= 0:
+                raise MessageTooLarge(f'Command is longer than {self.command_size_limit} bytes')
+
+            chunk = await self.reader.read(min(READ_CHUNK_SIZE, free))
+            if not chunk:
+                raise ConnectionError('Client closed the connection')
+            self.buffer += chunk
+
+    def is_connected(self) -> bool:
+        return not self.reader.at_eof() and not self.writer.is_closing()
+
+    def disconnect(self):
+        # close waits to flush the buffer, and a client that stopped reading would keep it forever
+        if self.buffered_bytes():
+            self.writer.transport.abort()
+        else:
+            self.writer.close()
+
+
+class GameView:
+    # shallow read-only proxy: only assigning attributes of the game itself is blocked, players, bullets
+    # and other objects reached through the view are the live ones and must not be mutated by a strategy
+    __slots__ = ('_game',)
+
+    def __init__(self, game):
+        object.__setattr__(self, '_game', game)
+
+    def __getattr__(self, name):
+        return getattr(self._game, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Game view is read-only')
+
+    def __delattr__(self, name):
+        raise AttributeError('Game view is read-only')
+
+
+class InProcessClient(Client):
+    # strategy is a callable (game_view, player_id) -> (move, dash, shot, pick_weapon)
+    # returning already built actions, so no JSON and no parse_command are involved
+    serialized = False
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.game = None
+        self.player_id = None
+        self.player = None
+
+    def start(self, game, player_id):
+        self.game = GameView(game)
+        self.player_id = player_id
+        self.player = game.get_player_by_id(player_id)
 
     async def send_message(self, msg):
-        msg_bytes = (msg+'\n').encode()
-        self.writer.write(msg_bytes)
+        pass
 
     async def get_command(self):
-        command = await self.reader.read(config.global_config.restrictions.command_size_limit)
-        return json.loads(command.decode())
+        # the actions go straight into Game.tick, so anything else disconnects the strategy here
+        command = self.strategy(self.game, self.player_id)
+        if type(command) is not tuple or len(command) != len(ACTION_TYPES):
+            raise InvalidAction(f'Expected a tuple of {len(ACTION_TYPES)} actions, got {command!r}')
+
+        for action, action_type in zip(command, ACTION_TYPES):
+            if action is None:
+                continue
+            if type(action) is not action_type:
+                raise InvalidAction(f'Expected {action_type.__name__} or None, got {action!r}')
+            if action.player is not self.player:
+                raise InvalidAction(f'{action_type.__name__} is built for another player')
+
+        return command
 
     def disconnect(self):
-        self.writer.close()
+        pass
+
+
+async def get_process_clients(strategies, game_config: GameConfig):
+    processes = []
+    for strategy in strategies:
+        process = asyncio.create_subprocess_shell(strategy,
+                                                  stdin=asyncio.subprocess.PIPE,
+                                                  stdout=asyncio.subprocess.PIPE,
+                                                  stderr=asyncio.subprocess.DEVNULL,
+                                                  start_new_session=True)
+        processes.append(process)
+
+    processes = await asyncio.gather(*processes)
+    clients = [ProcessClient(process, game_config) for process in processes]
+    return clients
+
+
+class ProcessPool:
+    # keeps strategy processes alive between matches, a process only plays the strategy command it was
+    # started with and is terminated after max_matches matches or when it was disconnected during a match
+    def __init__(self, game_config: GameConfig, max_matches: int):
+        self.game_config = game_config
+        self.max_matches = max_matches
+        self.idle = {}
+
+    async def acquire(self, strategy: str) -> ProcessClient:
+        idle = self.idle.get(strategy, [])
+        while idle:
+            client = idle.pop()
+            if client.process.returncode is None:
+                return client
+            # exited while waiting for a match
+            await client.process.wait()
+
+        (client,) = await get_process_clients([strategy], self.game_config)
+        return client
+
+    async def release(self, strategy: str, client: ProcessClient, connected: bool):
+        client.games_played += 1
+        if connected and client.process.returncode is None and client.games_played < self.max_matches:
+            self.idle.setdefault(strategy, []).append(client)
+            return
+
+        client.disconnect()
+        await reap_process(client.process)
+
+    async def close(self):
+        clients = [client for clients in self.idle.values() for client in clients]
+        self.idle = {}
+        for client in clients:
+            client.disconnect()
+        await asyncio.gather(*(reap_process(client.process) for client in clients))
+
+
+async def get_shm_clients(strategies, game_config: GameConfig):
+    channels = [Channel(game_config.restrictions.send_buffer_limit, SHM_COMMANDS_CAPACITY) for _ in strategies]
+    processes = []
+    for strategy, channel in zip(strategies, channels):
+        process = asyncio.create_subprocess_shell(strategy,
+                                                  stdin=asyncio.subprocess.DEVNULL,
+                                                  stdout=asyncio.subprocess.DEVNULL,
+                                                  stderr=asyncio.subprocess.DEVNULL,
+                                                  start_new_session=True,
+                                                  pass_fds=channel.child_fds(),
+                                                  env={**os.environ, **channel.child_env()})
+        processes.append(process)
+
+    processes = await asyncio.gather(*processes)
+    return [ShmClient(process, channel, game_config) for process, channel in zip(processes, channels)]
+
+
+def load_strategy(path: str):
+    # "package.module:factory", factory defaults to Strategy and is called to create a strategy callable
+    module_path, _, factory_name = path.partition(':')
+    module = importlib.import_module(module_path)
+    return getattr(module, factory_name or 'Strategy')()
@@ -21,6 +21,9 @@ def restricted_typing(value, expected_type):
 class ObjectConfig:
     def __init__(self, **kwargs):
         for name, expected_type in self.__annotations__.items():
+            if name not in kwargs and hasattr(type(self), name):
+                # optional field, the class attribute is its default
+                continue
             setattr(self, name, restricted_typing(kwargs[name], expected_type))
 
 
@@ -29,6 +32,25 @@ class RestrictionsConfig(ObjectConfig):
     response_timeout: float
     command_size_limit: int
     max_ticks: int
+    # strategies are asked for commands every action_repeat ticks, the last command is reapplied in between
+    action_repeat: int = 1
+    # unsent bytes of one client above which it is dropped as a slow consumer
+    send_buffer_limit: int = 16 * 1024 * 1024
+    # chess clock: seconds a client may think over the whole match, 0 keeps the flat execution_timeout.
+    # time_bank_increment is added before every command request, execution_timeout still caps one request
+    time_bank: float = 0
+    time_bank_increment: float = 0
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if not isinstance(self.action_repeat, int) or self.action_repeat < 1:
+            raise ConfigError(f'action_repeat must be a positive integer, got {self.action_repeat}')
+        if not isinstance(self.send_buffer_limit, int) or self.send_buffer_limit < 1:
+            raise ConfigError(f'send_buffer_limit must be a positive integer, got {self.send_buffer_limit}')
+        for name in ('time_bank', 'time_bank_increment'):
+            value = getattr(self, name)
+            if not isinstance(value, (int, float)) or not value >= 0:
+                raise ConfigError(f'{name} must be a non-negative number, got {value}')
 
 
 class WeaponConfig(ObjectConfig):
@@ -100,10 +122,3 @@ class GameConfig(ObjectConfig):
         self.raw_config = kwargs
         super().__init__(**kwargs)
 
-
-global_config: GameConfig = None
-
-
-def set_global_config(config: GameConfig):
-    global global_config
-    global_config = config
@@ -0,0 +1,75 @@
+import struct
+
+from game.game import Game
+
+
+# after the JSON config line every state is sent as <FRAME size><payload> and every command
+# comes back as one fixed COMMAND record. All numbers are little-endian.
+# payload: HEADER, PLAYER * players, BULLET * bullets, CHAINSAW * chainsaws, ITEM * items,
+# then the item ids of all players as unsigned bytes, PLAYER.items_count of them per player,
+# then TIME_BANK when the match has restrictions.time_bank.
+# strategies/binary_codec.py is the strategy side of the codec and must be kept in sync.
+FRAME = struct.Struct('<I')
+HEADER = struct.Struct('<IHIHH')  # ticks, players, bullets, chainsaws, items
+# PLAYER_FIELDS followed by items_count
+PLAYER = struct.Struct('<idddddiiiiiH')
+PLAYER_FIELDS = ('id', 'score', 'speed', 'position_x', 'position_y', 'hit_score', 'bullet_count',
+                 'shot_timeout', 'invulnerability_timeout', 'dash', 'dash_cooldown')
+BULLET = struct.Struct('<qidddd')  # id, player_id, position_x, position_y, velocity_x, velocity_y
+BULLET_FIELDS = ('id', 'player_id', 'position_x', 'position_y', 'velocity_x', 'velocity_y')
+CHAINSAW = struct.Struct('<ddiddd')  # position_x, position_y, target_index, target_x, target_y, radius
+CHAINSAW_FIELDS = ('position_x', 'position_y', 'target_index', 'target_x', 'target_y', 'radius')
+ITEM = struct.Struct('<Bdd')  # id, position_x, position_y
+ITEM_FIELDS = ('id', 'position_x', 'position_y')
+TIME_BANK = struct.Struct('<d')  # seconds left in the time bank of the receiving client
+
+COMMAND = struct.Struct('<Bdddd')  # flags, move direction_x, direction_y, shot point_x, point_y
+MOVE_FLAG = 1
+SHOT_FLAG = 2
+DASH_FLAG = 4
+PICK_WEAPON_FLAG = 8
+
+
+def encode_state(game: Game) -> bytes:
+    state = game.get_state()
+    bullet_ids = game.get_bullet_ids()
+
+    parts = [HEADER.pack(state['ticks'], len(state['players']), len(state['bullets']),
+                         len(state['chainsaws']), len(state['items']))]
+    player_items = []
+    for player in state['players']:
+        parts.append(PLAYER.pack(*(player[name] for name in PLAYER_FIELDS), len(player['items'])))
+        player_items += player['items']
+    for bullet, bullet_id in zip(state['bullets'], bullet_ids):
+        parts.append(BULLET.pack(bullet_id, *(bullet[name] for name in BULLET_FIELDS[1:])))
+    for chainsaw in state['chainsaws']:
+        parts.append(CHAINSAW.pack(*(chainsaw[name] for name in CHAINSAW_FIELDS)))
+    for item in state['items']:
+        parts.append(ITEM.pack(*(item[name] for name in ITEM_FIELDS)))
+    parts.append(bytes(player_items))
+
+    return b''.join(parts)
+
+
+def decode_command(data: bytes) -> dict:
+    # decoded into the JSON command shape so parse_command validates both protocols the same way
+    flags, direction_x, direction_y, point_x, point_y = COMMAND.unpack(data)
+
+    command = {}
+    if flags & MOVE_FLAG:
+        command['move'] = {'direction_x': direction_x, 'direction_y': direction_y}
+    if flags & SHOT_FLAG:
+        command['shot'] = {'point_x': point_x, 'point_y': point_y}
+    if flags & DASH_FLAG:
+        command['dash'] = True
+    if flags & PICK_WEAPON_FLAG:
+        command['pick_weapon'] = True
+
+    return command
+
+
+class BinaryStateEncoder:
+    name = 'binary'
+
+    def encode(self, game: Game) -> bytes:
+        return encode_state(game)
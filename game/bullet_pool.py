@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from game.weapons import Bullet
+from game.utils import Vec
+
+
+def segment_distance(start_x, start_y, step_x, step_y, x, y):
+    # distance from points to segments start + t * step, t in [0, 1], same arithmetic as segment_circle_collide
+    length_sq = step_x * step_x + step_y * step_y
+    projection = (x - start_x) * step_x + (y - start_y) * step_y
+    t = np.clip(np.divide(projection, length_sq, out=np.zeros(np.broadcast(projection, length_sq).shape),
+                          where=length_sq != 0), 0.0, 1.0)
+
+    return np.sqrt((start_x + t * step_x - x) ** 2 + (start_y + t * step_y - y) ** 2)
+
+
+class BulletPool:
+    # struct-of-arrays bullet storage, rows [0, size) are alive and kept in shot order
+    def __init__(self, capacity: int = 256):
+        if np is None:
+            raise RuntimeError('NumPy is required for the bullet pool')
+
+        self.size = 0
+        self.position = np.empty((capacity, 2), dtype=np.float64)
+        self.velocity = np.empty((capacity, 2), dtype=np.float64)
+        self.owner_id = np.empty(capacity, dtype=np.int64)
+        self.bullet_id = np.empty(capacity, dtype=np.int64)
+        self.created_at = np.empty(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, capacity: int):
+        if capacity <= len(self.owner_id):
+            return
+
+        capacity = max(capacity, 2 * len(self.owner_id))
+        for name in ('position', 'velocity', 'owner_id', 'bullet_id', 'created_at'):
+            column = getattr(self, name)
+            grown = np.empty((capacity, *column.shape[1:]), dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def add(self, bullets: list[Bullet]):
+        start = self.size
+        end = start + len(bullets)
+        self.reserve(end)
+
+        self.position[start:end] = [(bullet.position.x, bullet.position.y) for bullet in bullets]
+        self.velocity[start:end] = [(bullet.velocity.x, bullet.velocity.y) for bullet in bullets]
+        self.owner_id[start:end] = [bullet.player.id for bullet in bullets]
+        self.bullet_id[start:end] = [bullet.id for bullet in bullets]
+        self.created_at[start:end] = [bullet.created_at for bullet in bullets]
+        self.size = end
+
+    def compact(self, keep):
+        # removal of a batch of rows, survivors keep their relative order
+        kept = int(np.count_nonzero(keep))
+        if kept == self.size:
+            return
+
+        for column in (self.position, self.velocity, self.owner_id, self.bullet_id, self.created_at):
+            column[:kept] = column[:self.size][keep]
+        self.size = kept
+
+    def chainsaw_hits(self, chainsaws: list['Chainsaw'], starts: list[Vec], bullet_radius: float):
+        # chainsaws are swept from their start positions, a start equal to the position is a point check
+        position = self.position[:self.size]
+        starts_x = np.array([start.x for start in starts], dtype=np.float64)
+        starts_y = np.array([start.y for start in starts], dtype=np.float64)
+        steps_x = np.array([chainsaw.position.x for chainsaw in chainsaws], dtype=np.float64) - starts_x
+        steps_y = np.array([chainsaw.position.y for chainsaw in chainsaws], dtype=np.float64) - starts_y
+        reach = np.array([chainsaw.radius for chainsaw in chainsaws], dtype=np.float64) + bullet_radius
+
+        distance = segment_distance(starts_x, starts_y, steps_x, steps_y, position[:, 0, None], position[:, 1, None])
+        return (distance < reach).any(axis=1)
+
+    def outside_box(self, width: float, height: float):
+        x = self.position[:self.size, 0]
+        y = self.position[:self.size, 1]
+        return (x < 0) | (x > width) | (y < 0) | (y > height)
+
+    def player_hits(self, players: list['Player'], reach: float, swept: bool = False):
+        # (bullets, players) matrix of hits on players other than the bullet owner,
+        # swept bullets are checked along their whole next step
+        position = self.position[:self.size]
+        players_x = np.array([player.movement.position.x for player in players], dtype=np.float64)
+        players_y = np.array([player.movement.position.y for player in players], dtype=np.float64)
+        players_id = np.array([player.id for player in players], dtype=np.int64)
+
+        if swept:
+            velocity = self.velocity[:self.size]
+            distance = segment_distance(position[:, 0, None], position[:, 1, None],
+                                        velocity[:, 0, None], velocity[:, 1, None], players_x, players_y)
+        else:
+            distance = np.sqrt((position[:, 0, None] - players_x) ** 2 + (position[:, 1, None] - players_y) ** 2)
+        return (distance < reach) & (self.owner_id[:self.size, None] != players_id)
+
+    def snapshot(self) -> tuple:
+        return tuple(column[:self.size].copy()
+                     for column in (self.position, self.velocity, self.owner_id, self.bullet_id, self.created_at))
+
+    def restore(self, snapshot: tuple):
+        size = len(snapshot[0])
+        self.reserve(size)
+        for column, saved in zip((self.position, self.velocity, self.owner_id, self.bullet_id, self.created_at),
+                                 snapshot):
+            column[:size] = saved
+        self.size = size
+
+    @staticmethod
+    def hit_candidates(hits) -> list[tuple[int, list[int]]]:
+        # bullets with any hit in reverse order, each with its hit players in reverse order
+        return [
+            (bullet_index, np.flatnonzero(hits[bullet_index])[::-1].tolist())
+            for bullet_index in np.flatnonzero(hits.any(axis=1))[::-1].tolist()
+        ]
+
+    def move(self):
+        self.position[:self.size] += self.velocity[:self.size]
+
+    def get_ids(self) -> list[int]:
+        return self.bullet_id[:self.size].tolist()
+
+    def get_rows(self) -> list[tuple]:
+        owner_id = self.owner_id[:self.size].tolist()
+        position_x, position_y = self.position[:self.size].T.tolist()
+        velocity_x, velocity_y = self.velocity[:self.size].T.tolist()
+
+        return list(zip(owner_id, position_x, position_y, velocity_x, velocity_y))
@@ -1,30 +1,63 @@
+from bisect import bisect_left
+
 from game.utils import Vec
 
 
 class Chainsaw:
     def __init__(self, radius: float, speed: float, path: list[Vec]):
         self.radius = radius
-        self.position = path[0]
         self.speed = speed
         self.path = path
+
+        # closed path: segment i goes from path[i] to path[i + 1], the last one back to path[0].
+        # segment_ends[i] is the arc length at the end of segment i
+        self.segment_ends = []
+        self.segment_directions = []
+        length = 0.0
+        for index, start in enumerate(path):
+            end = path[(index + 1) % len(path)]
+            length += Vec.distance(start, end)
+            self.segment_ends.append(length)
+            self.segment_directions.append(Vec.unit(end - start))
+        self.length = length
+
+        self.ticks = 0
+        # position is owned and updated in place by move
+        self.position = Vec(path[0].x, path[0].y)
         self.target_index = 1
         self.target = self.path[self.target_index]
 
+    def locate(self, tick: int) -> tuple[float, float, int]:
+        # position after tick moves and the index of the waypoint it is heading to
+        if self.length == 0:
+            return self.path[0].x, self.path[0].y, 1 % len(self.path)
+
+        distance = self.speed * tick % self.length
+        if distance == 0 and tick * self.speed:
+            # a finished lap ends on path[0] like the walk along the waypoints did, still heading to it
+            distance = self.length
+        segment = bisect_left(self.segment_ends, distance)
+        if segment == len(self.path):
+            # rounding of the modulo can land on the very end of the path
+            segment -= 1
+
+        offset = distance - (self.segment_ends[segment - 1] if segment else 0.0)
+        start = self.path[segment]
+        direction = self.segment_directions[segment]
+        return start.x + direction.x * offset, start.y + direction.y * offset, (segment + 1) % len(self.path)
+
+    def position_at(self, tick: int) -> Vec:
+        # position in the game state with the given ticks, also for ticks in the future
+        x, y, _ = self.locate(tick)
+        return Vec(x, y)
+
     def move(self):
-        left_to_move = self.speed
-
-        while True:
-            current_target_dist = Vec.distance(self.position, self.target)
-            if current_target_dist < left_to_move:
-                self.position = self.target
-                left_to_move -= current_target_dist
-
-                self.target_index += 1
-                if self.target_index == len(self.path):
-                    self.target_index = 0
-                self.target = self.path[self.target_index]
-            else:
-                if left_to_move != 0:
-                    self.position = self.position + Vec.unit(self.target - self.position) * left_to_move
-
-                break
+        self.ticks += 1
+        self.position.x, self.position.y, self.target_index = self.locate(self.ticks)
+        self.target = self.path[self.target_index]
+
+    def snapshot(self) -> tuple:
+        return self.ticks, self.position.x, self.position.y, self.target_index, self.target
+
+    def restore(self, snapshot: tuple):
+        self.ticks, self.position.x, self.position.y, self.target_index, self.target = snapshot
@@ -0,0 +1,80 @@
+import json
+
+from game.game import Game
+
+
+def changed_fields(previous: dict, current: dict) -> dict:
+    return {name: value for name, value in current.items() if previous.get(name) != value}
+
+
+class DeltaEncoder:
+    # keyframe is the full state with bullet ids, deltas carry only what changed since the previous message.
+    # surviving bullets are not sent at all: they move by their velocity once per tick.
+    # strategies/delta_state.py reconstructs full states on the client side
+    name = 'delta'
+
+    def __init__(self, keyframe_period: int):
+        self.keyframe_period = keyframe_period
+        self.since_keyframe = 0
+        self.previous = None
+
+    def encode(self, game: Game) -> str:
+        return json.dumps(self.encode_state(game))
+
+    def encode_state(self, game: Game) -> dict:
+        state = game.get_state()
+        for bullet, bullet_id in zip(state['bullets'], game.get_bullet_ids()):
+            bullet['id'] = bullet_id
+
+        if self.previous is None or self.since_keyframe >= self.keyframe_period:
+            message = {'keyframe': True, **state}
+            self.since_keyframe = 0
+        else:
+            message = self.delta(self.previous, state)
+
+        self.since_keyframe += 1
+        self.previous = state
+        return message
+
+    @staticmethod
+    def delta(previous: dict, state: dict) -> dict:
+        players = []
+        for previous_player, player in zip(previous['players'], state['players']):
+            changed = changed_fields(previous_player, player)
+            if changed:
+                changed['id'] = player['id']
+                players.append(changed)
+
+        chainsaws = []
+        for index, (previous_chainsaw, chainsaw) in enumerate(zip(previous['chainsaws'], state['chainsaws'])):
+            changed = changed_fields(previous_chainsaw, chainsaw)
+            if changed:
+                changed['index'] = index
+                chainsaws.append(changed)
+
+        previous_bullets = {bullet['id'] for bullet in previous['bullets']}
+        current_bullets = {bullet['id'] for bullet in state['bullets']}
+
+        # items keep dict order in the game: survivors first, then new ones in insertion order.
+        # past the longest prefix the two lists share, every previous item is sent as disappeared and
+        # every current one as appeared, so the order is reproduced exactly even when an item is re-added
+        kept = 0
+        for previous_item, item in zip(previous['items'], state['items']):
+            if previous_item != item:
+                break
+            kept += 1
+
+        return {
+            'keyframe': False,
+            'ticks': state['ticks'],
+            'players': players,
+            'chainsaws': chainsaws,
+            'bullets': {
+                'spawned': [bullet for bullet in state['bullets'] if bullet['id'] not in previous_bullets],
+                'removed': [bullet['id'] for bullet in previous['bullets'] if bullet['id'] not in current_bullets],
+            },
+            'items': {
+                'appeared': state['items'][kept:],
+                'disappeared': [[item['position_x'], item['position_y']] for item in previous['items'][kept:]],
+            },
+        }
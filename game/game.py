@@ -4,37 +4,70 @@ from typing import Optional
 import random
 
 from game.player import Player
-from game.utils import circles_collide, is_outside_box
+from game.grid import UniformGrid
+from game.bullet_pool import BulletPool
+from game.utils import Vec, circles_collide, is_outside_box, segment_circle_collide
 from game.items import WEAPON_ITEM_CLASSES, WeaponItem, CrownItem
 from game.chainsaw import Chainsaw
 from game.modifiers import CrownModifier
 from game.weapons import ShotError
-import config
+from game.profiling import TickProfiler
+from config import GameConfig
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, game_config: GameConfig, bullet_pool: bool = False, seed=None,
+                 swept_collisions: bool = False, profiler: TickProfiler = None):
+        self.config = game_config
+        # constants of the inner loops flattened once, games with different configs can share a process
+        self.arena_width = game_config.arena.width
+        self.arena_height = game_config.arena.height
+        self.players_radius = game_config.players.radius
+        self.bullet_radius = game_config.items.weapons.bullet_radius
+        self.item_radius = game_config.items.radius
+        self.item_spots = game_config.items.spots
+        self.crown_spot = game_config.items.crown.spot
+        self.spawn_period = game_config.items.spawn_period
+        self.drop_out_invulnerability_timeout = game_config.players.drop_out_invulnerability_timeout
+        self.max_ticks = game_config.restrictions.max_ticks
+
+        # own generator so that snapshots can capture it without touching the global one
+        self.random = random.Random(seed)
+        # bullets and chainsaws collide along the whole step of a tick, not only at one end of it
+        self.swept_collisions = swept_collisions
+
         self.players = [
-            Player(player_spawn.id, player_spawn.position)
-            for player_spawn in config.global_config.players.spawns
+            Player(player_spawn.id, player_spawn.position, game_config)
+            for player_spawn in game_config.players.spawns
         ]
 
         self.bullets = []
+        self.next_bullet_id = 0
+        self.bullet_pool = BulletPool() if bullet_pool else None
 
         self.chainsaws = [
             Chainsaw(chainsaw.radius, chainsaw.speed, chainsaw.path)
-            for chainsaw in config.global_config.chainsaws
+            for chainsaw in game_config.chainsaws
         ]
 
         self.items = {
-            spot: random.choice(WEAPON_ITEM_CLASSES)()
-            for spot in config.global_config.items.spots
+            spot: self.random.choice(WEAPON_ITEM_CLASSES)(game_config)
+            for spot in self.item_spots
         }
-        self.items[config.global_config.items.crown.spot] = CrownItem()
+        self.items[self.crown_spot] = CrownItem()
         self.modifiers = []
 
+        cell_size = 2 * max(self.players_radius, self.bullet_radius)
+        self.players_grid = UniformGrid(cell_size)
+        self.bullets_grid = UniformGrid(cell_size)
+        self.pickers_grid = UniformGrid(cell_size)
+
         self.ticks = 0
 
+        self.profiler = profiler
+        if profiler is not None:
+            profiler.attach(self)
+
     def tick(self, commands):
         move_directions, dashes, shots, pick_weapons = self.split_actions(commands)
 
@@ -73,6 +106,15 @@ class Game:
 
         return actions
 
+    @staticmethod
+    def step_query(grid: UniformGrid, start: Vec, end: Vec, reach: float) -> list[int]:
+        if start is end:
+            return grid.query(end, reach)
+
+        # the circle around the middle of the step covers both of its ends
+        middle = Vec((start.x + end.x) / 2, (start.y + end.y) / 2)
+        return grid.query(middle, reach + Vec.distance(start, end) / 2)
+
     def get_active_players(self):
         return [
             player for player in self.players if player.invulnerability.is_over()
@@ -81,53 +123,164 @@ class Game:
     def chainsaw_logic(self) -> list[Player]:
         active_players = self.get_active_players()
 
+        players_radius = self.players_radius
+
+        self.players_grid.rebuild([player.movement.position for player in active_players])
+        dropped_players = set()
+
+        chainsaw_starts = []
         for chainsaw in self.chainsaws:
-            chainsaw.move()
+            if self.swept_collisions:
+                # the position is updated in place by move
+                start = Vec(chainsaw.position.x, chainsaw.position.y)
+                chainsaw.move()
+            else:
+                chainsaw.move()
+                start = chainsaw.position
+            chainsaw_starts.append(start)
+
+            candidates = self.step_query(self.players_grid, start, chainsaw.position,
+                                         players_radius + chainsaw.radius)
+            for player_index in sorted(candidates, reverse=True):
+                if player_index in dropped_players:
+                    continue
 
-            for player_index in range(len(active_players) - 1, -1, -1):
                 player = active_players[player_index]
-                if circles_collide(player.movement.position, chainsaw.position,
-                                   config.global_config.players.radius, chainsaw.radius):
+                if segment_circle_collide(start, chainsaw.position, player.movement.position,
+                                          chainsaw.radius, players_radius):
                     self.drop_player(player)
-                    del active_players[player_index]
+                    dropped_players.add(player_index)
 
-            for bullet_index in range(len(self.bullets) - 1, -1, -1):
-                bullet = self.bullets[bullet_index]
-                if circles_collide(bullet.position, chainsaw.position,
-                                   config.global_config.items.weapons.bullet_radius,
-                                   chainsaw.radius):
-                    del self.bullets[bullet_index]
+        self.chainsaw_bullets_logic(chainsaw_starts)
+
+        return [
+            player for player_index, player in enumerate(active_players)
+            if player_index not in dropped_players
+        ]
+
+    def chainsaw_bullets_logic(self, chainsaw_starts: list[Vec]):
+        bullet_radius = self.bullet_radius
 
-        return active_players
+        if self.bullet_pool is not None:
+            if self.bullet_pool.size and self.chainsaws:
+                self.bullet_pool.compact(~self.bullet_pool.chainsaw_hits(self.chainsaws, chainsaw_starts,
+                                                                         bullet_radius))
+            return
+
+        self.bullets_grid.rebuild([bullet.position for bullet in self.bullets])
+        removed_bullets = set()
+
+        for chainsaw, start in zip(self.chainsaws, chainsaw_starts):
+            candidates = self.step_query(self.bullets_grid, start, chainsaw.position,
+                                         bullet_radius + chainsaw.radius)
+            for bullet_index in candidates:
+                if bullet_index in removed_bullets:
+                    continue
+
+                bullet = self.bullets[bullet_index]
+                if segment_circle_collide(start, chainsaw.position, bullet.position,
+                                          chainsaw.radius, bullet_radius):
+                    removed_bullets.add(bullet_index)
+
+        if removed_bullets:
+            self.bullets = [
+                bullet for bullet_index, bullet in enumerate(self.bullets)
+                if bullet_index not in removed_bullets
+            ]
 
     def bullets_logic(self, active_players):
+        if self.bullet_pool is not None:
+            return self.bullet_pool_logic(active_players)
+
+        players_radius = self.players_radius
+        bullet_radius = self.bullet_radius
+        arena_width = self.arena_width
+        arena_height = self.arena_height
+
+        self.players_grid.rebuild([player.movement.position for player in active_players])
+        dropped_players = set()
+        removed_bullets = set()
+
         for bullet_index in range(len(self.bullets) - 1, -1, -1):
             bullet = self.bullets[bullet_index]
-            if is_outside_box(bullet.position.x, bullet.position.y,
-                              config.global_config.arena.width,
-                              config.global_config.arena.height):
-                del self.bullets[bullet_index]
+            if is_outside_box(bullet.position.x, bullet.position.y, arena_width, arena_height):
+                removed_bullets.add(bullet_index)
                 continue
 
-            for player_index in range(len(active_players) - 1, -1, -1):
+            if self.swept_collisions:
+                end = bullet.position + bullet.velocity
+            else:
+                end = bullet.position
+
+            candidates = self.step_query(self.players_grid, bullet.position, end, bullet_radius + players_radius)
+            for player_index in sorted(candidates, reverse=True):
+                if player_index in dropped_players:
+                    continue
+
                 player = active_players[player_index]
                 if (bullet.player != player
-                        and circles_collide(bullet.position, player.movement.position,
-                                            config.global_config.items.weapons.bullet_radius,
-                                            config.global_config.players.radius)):
+                        and segment_circle_collide(bullet.position, end, player.movement.position,
+                                                   bullet_radius, players_radius)):
 
                     bullet.player.score += bullet.player.weapon.hit_score
 
-                    del self.bullets[bullet_index]
+                    removed_bullets.add(bullet_index)
 
                     self.drop_player(player)
-                    del active_players[player_index]
+                    dropped_players.add(player_index)
 
                     break
             else:
                 bullet.move()
 
-        return active_players
+        if removed_bullets:
+            self.bullets = [
+                bullet for bullet_index, bullet in enumerate(self.bullets)
+                if bullet_index not in removed_bullets
+            ]
+
+        return [
+            player for player_index, player in enumerate(active_players)
+            if player_index not in dropped_players
+        ]
+
+    def bullet_pool_logic(self, active_players):
+        pool = self.bullet_pool
+        if not pool.size:
+            return active_players
+
+        removed = pool.outside_box(self.arena_width, self.arena_height)
+
+        dropped_players = set()
+        if active_players:
+            hits = pool.player_hits(active_players, self.bullet_radius + self.players_radius,
+                                    self.swept_collisions)
+            hits[removed] = False
+
+            # hits are rare, resolve them one by one in the same order as the list store does
+            owners = {player.id: player for player in self.players}
+            for bullet_index, player_indices in pool.hit_candidates(hits):
+                for player_index in player_indices:
+                    if player_index in dropped_players:
+                        continue
+
+                    owner = owners[int(pool.owner_id[bullet_index])]
+                    owner.score += owner.weapon.hit_score
+
+                    removed[bullet_index] = True
+
+                    self.drop_player(active_players[player_index])
+                    dropped_players.add(player_index)
+
+                    break
+
+        pool.move()
+        pool.compact(~removed)
+
+        return [
+            player for player_index, player in enumerate(active_players)
+            if player_index not in dropped_players
+        ]
 
     def item_logic(self, active_players, pick_weapons):
         players_trying_pick = [
@@ -136,18 +289,26 @@ class Game:
             if pick_weapon.player in active_players
         ]
 
+        players_radius = self.players_radius
+        item_radius = self.item_radius
+
+        self.players_grid.rebuild([player.movement.position for player in active_players])
+        self.pickers_grid.rebuild([player.movement.position for player in players_trying_pick])
+
         for item_position, item in list(self.items.items()):
 
             if isinstance(item, WeaponItem):
                 check_players = players_trying_pick
+                grid = self.pickers_grid
             else:
                 check_players = active_players
+                grid = self.players_grid
 
             player_collides = None
-            for player in check_players:
+            for player_index in grid.query(item_position, players_radius + item_radius):
+                player = check_players[player_index]
                 if circles_collide(player.movement.position, item_position,
-                                   config.global_config.players.radius,
-                                   config.global_config.items.radius):
+                                   players_radius, item_radius):
                     # item can't be picked up when it collides with multiple players
                     if player_collides is None:
                         player_collides = player
@@ -162,23 +323,23 @@ class Game:
                     self.modifiers.append(modifier)
 
     def spawn_item(self):
-        if self.ticks % config.global_config.items.spawn_period != 0:
+        if self.ticks % self.spawn_period != 0:
             return
 
-        empty_spots = list(set(config.global_config.items.spots).difference(self.items.keys()))
+        empty_spots = list(set(self.item_spots).difference(self.items.keys()))
         if not empty_spots:
             return
 
-        spot = random.choice(empty_spots)
-        item = random.choice(WEAPON_ITEM_CLASSES)()
+        spot = self.random.choice(empty_spots)
+        item = self.random.choice(WEAPON_ITEM_CLASSES)(self.config)
 
         self.items[spot] = item
 
     def drop_player(self, player):
         if any(isinstance(item, CrownItem) for item in player.items):
-            self.items[config.global_config.items.crown.spot] = CrownItem()
+            self.items[self.crown_spot] = CrownItem()
 
-        player.drop_out(config.global_config.players.drop_out_invulnerability_timeout)
+        player.drop_out(self.drop_out_invulnerability_timeout)
 
         self.modifiers = [
             modifier
@@ -193,10 +354,65 @@ class Game:
             except ShotError:
                 continue
             else:
-                self.bullets += bullets
+                for bullet in bullets:
+                    bullet.id = self.next_bullet_id
+                    self.next_bullet_id += 1
+
+                if self.bullet_pool is not None:
+                    self.bullet_pool.add(bullets)
+                else:
+                    self.bullets += bullets
+
+    def snapshot(self) -> tuple:
+        # entities are captured by reference with their mutable fields, positions are updated in place so
+        # their coordinates are copied, other vectors are never mutated
+        if self.bullet_pool is not None:
+            bullets = self.bullet_pool.snapshot()
+        else:
+            bullets = [(bullet, bullet.position.x, bullet.position.y) for bullet in self.bullets]
+
+        return (
+            self.ticks,
+            self.next_bullet_id,
+            self.random.getstate(),
+            [player.snapshot() for player in self.players],
+            bullets,
+            [chainsaw.snapshot() for chainsaw in self.chainsaws],
+            dict(self.items),
+            [(modifier, modifier.player) for modifier in self.modifiers],
+        )
+
+    def restore(self, snapshot: tuple):
+        ticks, next_bullet_id, random_state, players, bullets, chainsaws, items, modifiers = snapshot
+
+        self.ticks = ticks
+        self.next_bullet_id = next_bullet_id
+        self.random.setstate(random_state)
+
+        for player, player_snapshot in zip(self.players, players):
+            player.restore(player_snapshot)
+
+        if self.bullet_pool is not None:
+            self.bullet_pool.restore(bullets)
+        else:
+            self.bullets = []
+            for bullet, position_x, position_y in bullets:
+                bullet.position.x = position_x
+                bullet.position.y = position_y
+                self.bullets.append(bullet)
+
+        for chainsaw, chainsaw_snapshot in zip(self.chainsaws, chainsaws):
+            chainsaw.restore(chainsaw_snapshot)
+
+        self.items = dict(items)
+
+        self.modifiers = []
+        for modifier, player in modifiers:
+            modifier.player = player
+            self.modifiers.append(modifier)
 
     def is_ended(self):
-        return self.ticks == config.global_config.restrictions.max_ticks
+        return self.ticks == self.max_ticks
 
     def get_player_by_id(self, player_id: int) -> Optional[Player]:
         for player in self.players:
@@ -222,14 +438,7 @@ class Game:
                 }
                 for player in self.players
             ],
-            'bullets': [
-                {
-                    'player_id': bullet.player.id,
-                    'position_x': bullet.position.x, 'position_y': bullet.position.y,
-                    'velocity_x': bullet.velocity.x, 'velocity_y': bullet.velocity.y
-                }
-                for bullet in self.bullets
-            ],
+            'bullets': self.get_bullets_state(),
             'chainsaws': [
                 {
                     'position_x': chainsaw.position.x,
@@ -246,3 +455,29 @@ class Game:
                 for item_position, item in self.items.items()
             ]
         }
+
+    def get_bullet_ids(self) -> list[int]:
+        if self.bullet_pool is not None:
+            return self.bullet_pool.get_ids()
+
+        return [bullet.id for bullet in self.bullets]
+
+    def get_bullet_rows(self) -> list[tuple]:
+        # (player_id, position_x, position_y, velocity_x, velocity_y) of every bullet
+        if self.bullet_pool is not None:
+            return self.bullet_pool.get_rows()
+
+        return [
+            (bullet.player.id, bullet.position.x, bullet.position.y, bullet.velocity.x, bullet.velocity.y)
+            for bullet in self.bullets
+        ]
+
+    def get_bullets_state(self):
+        return [
+            {
+                'player_id': player_id,
+                'position_x': position_x, 'position_y': position_y,
+                'velocity_x': velocity_x, 'velocity_y': velocity_y
+            }
+            for player_id, position_x, position_y, velocity_x, velocity_y in self.get_bullet_rows()
+        ]
@@ -1,53 +1,154 @@
 import asyncio
-import json
 import random
+from time import monotonic, perf_counter_ns
 
+from game.binary_codec import TIME_BANK
 from game.game import Game
+from game.replay import ReplayWriter, command_to_record
+from game.state_serializer import StateSerializer
+from game.telemetry import Telemetry
 from clients import Client
-import config
-from parsing import parse_command
+from parsing import CommandParser
+
+
+class TimeBankExhausted(Exception):
+    pass
+
+
+def add_time_bank(message, time_bank: float):
+    if isinstance(message, bytes):
+        return message + TIME_BANK.pack(time_bank)
+
+    # a full or delta JSON state, both are objects
+    return f'{message[:-1]}, "time_bank": {time_bank!r}}}'
 
 
 class GameLoop:
-    def __init__(self, game: Game, clients: list[Client]):
+    def __init__(self, game: Game, clients: list[Client], replay: ReplayWriter = None, state_encoder=None,
+                 telemetry: Telemetry = None):
         self.game = game
+        self.config = game.config
+        self.replay = replay
+        # encoder of state messages other than the full JSON state, see game.delta and game.binary_codec
+        self.state_encoder = state_encoder
+        self.state_serializer = StateSerializer()
+        self.command_parser = CommandParser(game)
+        self.telemetry = telemetry
+        # perf_counter_ns when the last state was sent to a client or an in-process strategy was called,
+        # think time is measured from it
+        self.sent_at = {}
         random.shuffle(clients)
         self.clients = dict(enumerate(clients))
+        # seconds left to every client when the match has restrictions.time_bank
+        self.time_banks = None
+        if self.config.restrictions.time_bank:
+            self.time_banks = dict.fromkeys(self.clients, float(self.config.restrictions.time_bank))
         self.keep_work = True
 
     def stop(self):
         self.keep_work = False
 
     async def play(self):
+        try:
+            await self.run()
+        finally:
+            if self.replay is not None:
+                # flushing the last chunk and joining the writer thread must not block the event loop
+                await asyncio.to_thread(self.replay.close)
+
+    async def run(self):
         # send game config
-        config_json = config.global_config.raw_config.copy()
+        config_json = self.config.raw_config.copy()
+        state_encoding = 'full' if self.state_encoder is None else self.state_encoder.name
+        config_json['state_encoding'] = state_encoding
+        restrictions = self.config.restrictions
+        action_repeat = restrictions.action_repeat
+        config_json['restrictions'] = {**config_json['restrictions'], 'action_repeat': action_repeat,
+                                       'time_bank': restrictions.time_bank,
+                                       'time_bank_increment': restrictions.time_bank_increment}
 
         messages = []
-        for client_id in self.clients:
-            config_json['my_id'] = client_id
-            messages.append(self.send_message_wrapper(client_id, json.dumps(config_json)))
+        for client_id, client in self.clients.items():
+            if client.serialized:
+                client.state_encoding = state_encoding
+                config_json['my_id'] = client_id
+                messages.append(self.send_message_wrapper(client_id, client.config_message(config_json)))
+            else:
+                client.start(self.game, client_id)
 
         await self.send_messages(messages)
 
         # game
+        parsed_commands = []
+        command_records = []
         while not self.game.is_ended() and self.clients and self.keep_work:
-            # send game state
-            state = json.dumps(self.game.get_state())
-            await self.send_messages([self.send_message_wrapper(client_id, state) for client_id in self.clients])
-
-            commands = await self.get_commands()
-
-            parsed_commands = []
-            for client_id, command in commands:
-                if command is None:
-                    continue
-
-                parsed_command = parse_command(self.game, client_id, command)
-                parsed_commands.append(parsed_command)
-
-            self.game.tick(parsed_commands)
-
-        # self.game.save_log('result.json')
+            state = None
+            # between requests strategies get no state and their last commands are applied again
+            if self.game.ticks % action_repeat == 0:
+                parsed_commands, command_records, state = await self.request_commands()
+
+            if self.replay is not None:
+                record = (self.game.ticks, state if state is not None else self.game.get_state(), command_records)
+                # a full queue is waited for in a thread, so a slow disk doesn't block the event loop
+                if not self.replay.try_record(*record):
+                    await asyncio.to_thread(self.replay.record, *record)
+
+            if self.telemetry is None:
+                self.game.tick(parsed_commands)
+            else:
+                start = perf_counter_ns()
+                self.game.tick(parsed_commands)
+                self.telemetry.tick_time_ns.record(perf_counter_ns() - start)
+
+        if self.telemetry is not None:
+            self.telemetry.close()
+
+        if self.game.profiler is not None:
+            self.game.profiler.close()
+
+    async def request_commands(self):
+        # send game state
+        serialized_ids = [client_id for client_id, client in self.clients.items() if client.serialized]
+        state = None
+        if self.time_banks is not None:
+            increment = self.config.restrictions.time_bank_increment
+            for client_id in self.time_banks:
+                self.time_banks[client_id] += increment
+
+        if serialized_ids:
+            if self.state_encoder is None:
+                state = self.state_serializer.serialize(self.game)
+                message = state
+            else:
+                message = self.state_encoder.encode(self.game)
+
+            if self.time_banks is None:
+                send_fs = [self.send_message_wrapper(client_id, message, is_state=True)
+                           for client_id in serialized_ids]
+            else:
+                send_fs = [self.send_message_wrapper(client_id, add_time_bank(message, self.time_banks[client_id]),
+                                                     is_state=True)
+                           for client_id in serialized_ids]
+            await self.send_messages(send_fs)
+
+        commands = await self.get_commands()
+
+        # in-process strategies return already built actions, the rest is parsed in one batch
+        serialized_commands = [(client_id, command) for client_id, command in commands
+                               if self.clients[client_id].serialized]
+        if len(serialized_commands) == len(commands):
+            parsed_commands = self.command_parser.parse_commands(serialized_commands)
+        else:
+            parsed = iter(self.command_parser.parse_commands(serialized_commands))
+            parsed_commands = [next(parsed) if self.clients[client_id].serialized else command
+                               for client_id, command in commands]
+
+        command_records = []
+        if self.replay is not None:
+            command_records = [command_to_record(client_id, parsed_command)
+                               for (client_id, _), parsed_command in zip(commands, parsed_commands)]
+
+        return parsed_commands, command_records, state
 
     async def get_commands(self):
         client_ids = list(self.clients.keys())
@@ -60,25 +161,67 @@ class GameLoop:
         return client_commands
 
     async def get_command_wrapper(self, client_id):
-        # TODO don't know about execution time
         # requests command but if it fails disconnects client
+        client = self.clients[client_id]
+        timeout = self.config.restrictions.execution_timeout
+        if self.time_banks is not None:
+            time_bank = self.time_banks[client_id]
+            timeout = min(timeout, time_bank)
+            start = monotonic()
         try:
-            return await asyncio.wait_for(self.clients[client_id].get_command(),
-                                          timeout=config.global_config.restrictions.execution_timeout)
-        except:
-            self.disconnect_client(client_id)
-
-    async def send_message_wrapper(self, client_id, msg):
+            if not client.serialized:
+                # in-process strategy runs synchronously, timeout can't interrupt it anyway
+                self.sent_at[client_id] = perf_counter_ns() if self.telemetry is not None else None
+                command = await client.get_command()
+            else:
+                command = await asyncio.wait_for(client.get_command(), timeout=timeout)
+        except asyncio.TimeoutError as e:
+            if self.time_banks is not None and timeout == time_bank:
+                e = TimeBankExhausted(f'{time_bank:.3f} s time bank is exhausted')
+            self.disconnect_client(client_id, e)
+            return None
+        except BaseException as e:
+            self.disconnect_client(client_id, e)
+            return None
+
+        if self.time_banks is not None:
+            time_bank -= monotonic() - start
+            if time_bank <= 0:
+                # in-process strategies are never interrupted and the others may answer right at the timeout
+                self.disconnect_client(client_id, TimeBankExhausted('time bank is exhausted'))
+                return None
+            self.time_banks[client_id] = time_bank
+
+        if self.telemetry is not None:
+            client_telemetry = self.telemetry.client(client_id)
+            client_telemetry.think_time_ns.record(perf_counter_ns() - self.sent_at[client_id])
+            client_telemetry.command_size.record(client.command_size)
+        return command
+
+    async def send_message_wrapper(self, client_id, msg, is_state=False):
         # send message but if it fails disconnect client
+        start = perf_counter_ns() if self.telemetry is not None else None
         try:
             await asyncio.wait_for(self.clients[client_id].send_message(msg),
-                                   timeout=config.global_config.restrictions.response_timeout)
-        except Exception:
-            self.disconnect_client(client_id)
+                                   timeout=self.config.restrictions.response_timeout)
+        except Exception as e:
+            self.disconnect_client(client_id, e)
+            return
+
+        if is_state and self.telemetry is not None:
+            self.sent_at[client_id] = end = perf_counter_ns()
+            client_telemetry = self.telemetry.client(client_id)
+            client_telemetry.send_latency_ns.record(end - start)
+            client_telemetry.state_size.record(len(msg))
 
     async def send_messages(self, send_fs):
         if send_fs:
-            await asyncio.wait(send_fs)
+            await asyncio.gather(*send_fs)
 
-    def disconnect_client(self, client_id):
+    def disconnect_client(self, client_id, reason: BaseException = None):
+        # clients still connected at the end of the match have no reason
+        if self.telemetry is not None and reason is not None:
+            self.telemetry.client(client_id).disconnect_reason = repr(reason)
         self.clients.pop(client_id).disconnect()
+        if self.time_banks is not None:
+            del self.time_banks[client_id]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from game.utils import Vec
+
+
+class UniformGrid:
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[int]] = {}
+
+    def rebuild(self, positions: list[Vec]):
+        self.cells.clear()
+
+        cell_size = self.cell_size
+        cells = self.cells
+        for index, position in enumerate(positions):
+            try:
+                key = (int(position.x // cell_size), int(position.y // cell_size))
+            except (ValueError, OverflowError):
+                # nan position can't collide with anything
+                continue
+
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [index]
+            else:
+                cell.append(index)
+
+    def query(self, position: Vec, reach: float) -> list[int]:
+        if not self.cells:
+            return []
+
+        cell_size = self.cell_size
+        # pad the reach so that float rounding on cell borders never loses a candidate
+        reach += cell_size * 1e-9
+        try:
+            min_x = int((position.x - reach) // cell_size)
+            max_x = int((position.x + reach) // cell_size)
+            min_y = int((position.y - reach) // cell_size)
+            max_y = int((position.y + reach) // cell_size)
+        except (ValueError, OverflowError):
+            return []
+
+        cells = self.cells
+        candidates = []
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                cell = cells.get((cell_x, cell_y))
+                if cell is not None:
+                    candidates += cell
+
+        return candidates
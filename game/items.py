@@ -3,7 +3,7 @@ from typing import Optional
 from game.modifiers import CrownModifier, Modifier
 from game.weapons import Shotgun, Pistol, SniperRifle
 
-import config
+from config import GameConfig
 
 
 class Item:
@@ -21,6 +21,8 @@ class CrownItem(Item):
 
 
 class WeaponItem(Item):
+    def __init__(self, game_config: GameConfig):
+        self.weapons = game_config.items.weapons
 
     def apply(self, player):
         player.pick_weapon(self.construct_weapon())
@@ -34,11 +36,11 @@ class ShotgunItem(WeaponItem):
 
     def construct_weapon(self):
         return Shotgun(
-            config.global_config.items.weapons.shotgun.hit_score,
-            config.global_config.items.weapons.shotgun.initial_bullets,
-            config.global_config.items.weapons.shotgun.shot_timeout,
-            config.global_config.items.weapons.shotgun.bullet_speed,
-            config.global_config.items.weapons.shotgun.shot_offset
+            self.weapons.shotgun.hit_score,
+            self.weapons.shotgun.initial_bullets,
+            self.weapons.shotgun.shot_timeout,
+            self.weapons.shotgun.bullet_speed,
+            self.weapons.shotgun.shot_offset
         )
 
 
@@ -47,11 +49,11 @@ class SniperRifleItem(WeaponItem):
 
     def construct_weapon(self):
         return SniperRifle(
-            config.global_config.items.weapons.sniper_rifle.hit_score,
-            config.global_config.items.weapons.sniper_rifle.initial_bullets,
-            config.global_config.items.weapons.sniper_rifle.shot_timeout,
-            config.global_config.items.weapons.sniper_rifle.bullet_speed,
-            config.global_config.items.weapons.sniper_rifle.shot_offset
+            self.weapons.sniper_rifle.hit_score,
+            self.weapons.sniper_rifle.initial_bullets,
+            self.weapons.sniper_rifle.shot_timeout,
+            self.weapons.sniper_rifle.bullet_speed,
+            self.weapons.sniper_rifle.shot_offset
         )
 
 
@@ -60,11 +62,11 @@ class PistolItem(WeaponItem):
 
     def construct_weapon(self):
         return Pistol(
-            config.global_config.items.weapons.pistol.hit_score,
-            config.global_config.items.weapons.pistol.initial_bullets,
-            config.global_config.items.weapons.pistol.shot_timeout,
-            config.global_config.items.weapons.pistol.bullet_speed,
-            config.global_config.items.weapons.pistol.shot_offset
+            self.weapons.pistol.hit_score,
+            self.weapons.pistol.initial_bullets,
+            self.weapons.pistol.shot_timeout,
+            self.weapons.pistol.bullet_speed,
+            self.weapons.pistol.shot_offset
         )
 
 
@@ -1,29 +1,44 @@
 from __future__ import annotations
 
+import math
 from typing import Optional
 from game.utils import Vec
 from game.timer import Timer
 from game.weapons import ShotError, Weapon
 from game.modifiers import Modifier
 from game.items import PistolItem, Item
-import config
+from config import GameConfig
 
 
 class Movement:
-    def __init__(self, position: Vec):
-        self.position = position
-        self.speed = config.global_config.players.speed
+    def __init__(self, position: Vec, game_config: GameConfig):
+        # position is owned and updated in place, never share it
+        self.position = Vec(position.x, position.y)
+        self.speed = game_config.players.speed
         self.direction = None
 
+        self.arena_width = game_config.arena.width
+        self.arena_height = game_config.arena.height
+
     def move(self):
-        if self.direction is None:
+        direction = self.direction
+        if direction is None:
             return
 
-        self.position = self.position + Vec.unit(self.direction) * self.speed
+        # same arithmetic as position + Vec.unit(direction) * speed without the temporary vectors
+        length = math.sqrt(direction.x**2 + direction.y**2)
+        if length == 0:
+            unit_x = unit_y = 0.0
+        else:
+            unit_x = direction.x / length
+            unit_y = direction.y / length
+
+        position = self.position
+        speed = self.speed
 
         # player can't move outside the box
-        self.position.x = max(0.0, min(self.position.x, config.global_config.arena.width))
-        self.position.y = max(0.0, min(self.position.y, config.global_config.arena.height))
+        position.x = max(0.0, min(position.x + unit_x * speed, self.arena_width))
+        position.y = max(0.0, min(position.y + unit_y * speed, self.arena_height))
 
     def set_direction(self, direction: Vec):
         self.direction = direction
@@ -33,12 +48,17 @@ class Movement:
 
 
 class Player:
-    def __init__(self, id: int, spawn_position: Vec):
+    def __init__(self, id: int, spawn_position: Vec, game_config: GameConfig):
         self.id = id
         self.score = 0
+        self.config = game_config
+
+        self.dash_duration = game_config.players.dash.duration
+        self.dash_cooldown_duration = game_config.players.dash.cooldown
+        self.dash_speed_bonus = game_config.players.dash.speed_bonus
 
         self.spawn_position = spawn_position
-        self.movement = Movement(spawn_position)
+        self.movement = Movement(spawn_position, game_config)
 
         self.invulnerability = Timer()
         self.dash_cooldown = Timer()
@@ -46,7 +66,7 @@ class Player:
 
         self.items = []
         self.weapon = None
-        self.pick_item(PistolItem())
+        self.pick_item(PistolItem(self.config))
 
     def move(self):
         self.movement.move()
@@ -59,9 +79,9 @@ class Player:
         if (self.invulnerability.is_over()
                 and self.dash.is_over()
                 and self.dash_cooldown.is_over()):
-            self.dash.set(config.global_config.players.dash.duration)
-            self.invulnerability.set(config.global_config.players.dash.duration)
-            self.movement.set_speed(self.movement.speed + config.global_config.players.dash.speed_bonus)
+            self.dash.set(self.dash_duration)
+            self.invulnerability.set(self.dash_duration)
+            self.movement.set_speed(self.movement.speed + self.dash_speed_bonus)
 
     def timeouts(self):
         self.invulnerability.tick()
@@ -70,8 +90,8 @@ class Player:
         if not self.dash.is_over():
             self.dash.tick()
             if self.dash.is_over():
-                self.movement.set_speed(self.movement.speed - config.global_config.players.dash.speed_bonus)
-                self.dash_cooldown.set(config.global_config.players.dash.cooldown)
+                self.movement.set_speed(self.movement.speed - self.dash_speed_bonus)
+                self.dash_cooldown.set(self.dash_cooldown_duration)
 
         self.dash_cooldown.tick()
 
@@ -82,7 +102,7 @@ class Player:
         bullets, is_last_shot = self.weapon.shot(target, tick)
 
         if is_last_shot:
-            self.pick_item(PistolItem())
+            self.pick_item(PistolItem(self.config))
 
         return bullets
 
@@ -97,8 +117,26 @@ class Player:
             self.weapon = weapon
             weapon.attach(self)
 
+    def snapshot(self) -> tuple:
+        return (
+            self.score,
+            self.movement.position.x, self.movement.position.y, self.movement.speed, self.movement.direction,
+            self.invulnerability.ticks, self.dash_cooldown.ticks, self.dash.ticks,
+            list(self.items),
+            self.weapon, self.weapon.bullet_count, self.weapon.shot_cooldown.ticks,
+        )
+
+    def restore(self, snapshot: tuple):
+        (self.score,
+         self.movement.position.x, self.movement.position.y, self.movement.speed, self.movement.direction,
+         self.invulnerability.ticks, self.dash_cooldown.ticks, self.dash.ticks,
+         items,
+         self.weapon, self.weapon.bullet_count, self.weapon.shot_cooldown.ticks) = snapshot
+        self.items = list(items)
+
     def drop_out(self, invulnerability_cooldown: int):
         self.invulnerability.set(invulnerability_cooldown)
-        self.movement.position = self.spawn_position
+        self.movement.position.x = self.spawn_position.x
+        self.movement.position.y = self.spawn_position.y
         self.items = []
-        self.pick_item(PistolItem())
+        self.pick_item(PistolItem(self.config))
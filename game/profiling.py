@@ -0,0 +1,155 @@
+import cProfile
+import io
+import pstats
+import sys
+import tracemalloc
+from time import perf_counter_ns
+
+
+# methods of Game that Game.tick calls through self, in order. The code inlined in tick between them
+# (applying actions, moving players, crown modifiers) is reported as other: tick time minus the phases
+PHASES = ('split_actions', 'chainsaw_logic', 'item_logic', 'spawn_item', 'bullets_logic', 'perform_shots')
+SAMPLE_MODES = ('cprofile', 'tracemalloc')
+REPORT_LINES = 25
+
+
+class TickProfiler:
+    # instruments one game by shadowing its tick and phase methods with instance attributes,
+    # a game that was never attached runs the plain methods and pays nothing.
+    # phases: perf_counter_ns time and calls of every phase;
+    # sample_period: runs cProfile or tracemalloc on every sample_period-th tick;
+    # tick_budget_ns: writes the phase breakdown of every tick that takes longer
+    def __init__(self, phases: bool = False, sample_period: int = 0, sample_mode: str = 'cprofile',
+                 tick_budget_ns: int = None, output=sys.stderr):
+        if sample_mode not in SAMPLE_MODES:
+            raise ValueError(f'Unknown sample mode {sample_mode}')
+
+        self.phases = phases or tick_budget_ns is not None
+        self.sample_period = sample_period
+        self.sample_mode = sample_mode
+        self.tick_budget_ns = tick_budget_ns
+        self.output = output
+
+        self.total_ns = dict.fromkeys(PHASES, 0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.tick_ns = dict.fromkeys(PHASES, 0)
+        self.ticks = 0
+        self.ticks_total_ns = 0
+        # tick time outside of the phases
+        self.other_ns = 0
+        self.slow_ticks = 0
+
+        self.profile = cProfile.Profile() if sample_period and sample_mode == 'cprofile' else None
+        # (file, line) -> [size, count] of the blocks allocated by sampled ticks and still alive after them
+        self.allocations = {}
+        self.samples = 0
+
+    def attach(self, game):
+        if self.phases:
+            for name in PHASES:
+                setattr(game, name, self.timed(name, getattr(game, name)))
+        if self.phases or self.sample_period:
+            game.tick = self.timed_tick(game, game.tick)
+
+    def timed(self, name, method):
+        total_ns = self.total_ns
+        calls = self.calls
+        tick_ns = self.tick_ns
+
+        def timed_method(*args):
+            start = perf_counter_ns()
+            result = method(*args)
+            elapsed = perf_counter_ns() - start
+            total_ns[name] += elapsed
+            calls[name] += 1
+            tick_ns[name] += elapsed
+            return result
+
+        return timed_method
+
+    def timed_tick(self, game, tick):
+        def timed_tick(commands):
+            sampled = self.sample_period and self.ticks % self.sample_period == 0
+            if self.phases:
+                for name in PHASES:
+                    self.tick_ns[name] = 0
+
+            start = perf_counter_ns()
+            if sampled:
+                self.sample(tick, commands)
+            else:
+                tick(commands)
+            elapsed = perf_counter_ns() - start
+
+            self.ticks += 1
+            self.ticks_total_ns += elapsed
+            if self.phases:
+                self.other_ns += elapsed - sum(self.tick_ns.values())
+            if self.tick_budget_ns is not None and elapsed > self.tick_budget_ns:
+                self.slow_ticks += 1
+                self.write_slow_tick(game.ticks - 1, elapsed)
+
+        return timed_tick
+
+    def sample(self, tick, commands):
+        self.samples += 1
+        if self.profile is not None:
+            self.profile.enable()
+            try:
+                tick(commands)
+            finally:
+                self.profile.disable()
+            return
+
+        tracemalloc.start()
+        try:
+            tick(commands)
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        for statistic in snapshot.statistics('lineno'):
+            frame = statistic.traceback[0]
+            entry = self.allocations.setdefault((frame.filename, frame.lineno), [0, 0])
+            entry[0] += statistic.size
+            entry[1] += statistic.count
+
+    def write_slow_tick(self, tick: int, elapsed: int):
+        phases = ' '.join(f'{name}={self.tick_ns[name] / 1e6:.3f}' for name in PHASES)
+        other = elapsed - sum(self.tick_ns.values())
+        print(f'tick {tick} took {elapsed / 1e6:.3f} ms: {phases} other={other / 1e6:.3f}',
+              file=self.output, flush=True)
+
+    def report(self) -> str:
+        lines = []
+        if self.ticks:
+            lines.append(f'{self.ticks} ticks, {self.ticks_total_ns / self.ticks / 1e3:.1f} us per tick')
+        if self.tick_budget_ns is not None:
+            lines.append(f'{self.slow_ticks} ticks over {self.tick_budget_ns / 1e6:g} ms')
+
+        if self.phases:
+            rows = [(name, self.calls[name], self.total_ns[name]) for name in PHASES]
+            rows.append(('other', self.ticks, self.other_ns))
+            total = sum(total_ns for _, _, total_ns in rows) or 1
+            lines.append(f'{"phase":<16} {"calls":>10} {"total ms":>12} {"us/call":>10} {"share":>7}')
+            for name, calls, total_ns in rows:
+                per_call = total_ns / calls / 1e3 if calls else 0.0
+                lines.append(f'{name:<16} {calls:>10} {total_ns / 1e6:>12.1f} {per_call:>10.1f} '
+                             f'{total_ns / total:>7.1%}')
+
+        if self.profile is not None and self.samples:
+            stream = io.StringIO()
+            pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(REPORT_LINES)
+            lines.append(f'cProfile of {self.samples} sampled ticks:')
+            lines.append(stream.getvalue().rstrip())
+
+        if self.allocations:
+            lines.append(f'allocations alive after {self.samples} sampled ticks:')
+            top = sorted(self.allocations.items(), key=lambda item: item[1][0], reverse=True)[:REPORT_LINES]
+            for (filename, lineno), (size, count) in top:
+                lines.append(f'{size:>10} B {count:>8} blocks  {filename}:{lineno}')
+
+        return '\n'.join(lines)
+
+    def close(self):
+        print(self.report(), file=self.output, flush=True)
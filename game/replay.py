@@ -0,0 +1,148 @@
+import json
+import queue
+import struct
+import threading
+import zlib
+from typing import Iterator
+
+
+# file: MAGIC, then chunks of <compressed size><zlib data>
+# chunk data: records of <size><compact json>, the first record of a file is the game config
+MAGIC = b'SRPL\x01'
+SIZE = struct.Struct('<I')
+CHUNK_SIZE = 1 << 20
+# seconds between checks that the writer thread is still alive while waiting for room in the queue
+PUT_INTERVAL = 0.1
+
+
+class ReplayError(Exception):
+    pass
+
+
+def command_to_record(player_id, command) -> dict:
+    move, dash, shot, pick_weapon = command
+    return {
+        'player_id': player_id,
+        'move': None if move is None else [move.direction.x, move.direction.y],
+        'dash': dash is not None,
+        'shot': None if shot is None else [shot.point.x, shot.point.y],
+        'pick_weapon': pick_weapon is not None,
+    }
+
+
+class ReplayWriter:
+    def __init__(self, path: str, game_config: dict, chunk_size: int = CHUNK_SIZE, queue_size: int = 4096):
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.chunk_size = chunk_size
+        self.chunk = bytearray()
+
+        # bounded so a slow disk throttles the game instead of growing memory
+        self.queue = queue.Queue(maxsize=queue_size)
+        # exception that stopped the writer thread, raised again by record and close
+        self.error = None
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+        self.put(game_config)
+
+    def check(self):
+        if self.error is not None:
+            raise ReplayError(f'Writing the replay failed: {self.error!r}') from self.error
+
+    def put(self, item):
+        # waits for room while the writer is alive, a dead writer never frees any
+        while True:
+            self.check()
+            try:
+                self.queue.put(item, timeout=PUT_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def try_record(self, tick: int, state, commands: list[dict]) -> bool:
+        # never blocks, returns False when the queue is full
+        self.check()
+        try:
+            self.queue.put_nowait((tick, state, commands))
+        except queue.Full:
+            return False
+        return True
+
+    def record(self, tick: int, state, commands: list[dict]):
+        # state is the state dict or the already dumped state json
+        self.put((tick, state, commands))
+
+    def close(self):
+        if self.thread.is_alive():
+            self.put(None)
+            self.thread.join()
+        self.check()
+
+    def write_loop(self):
+        try:
+            while (item := self.queue.get()) is not None:
+                if isinstance(item, tuple):
+                    tick, state, commands = item
+                    if not isinstance(state, str):
+                        state = json.dumps(state, separators=(',', ':'))
+                    commands = json.dumps(commands, separators=(',', ':'))
+                    data = f'{{"tick":{tick},"state":{state},"commands":{commands}}}'.encode()
+                else:
+                    data = json.dumps(item, separators=(',', ':')).encode()
+
+                self.chunk += SIZE.pack(len(data))
+                self.chunk += data
+                if len(self.chunk) >= self.chunk_size:
+                    self.flush()
+
+            self.flush()
+        except BaseException as e:
+            self.error = e
+        finally:
+            try:
+                self.file.close()
+            except OSError as e:
+                # closing flushes the buffered tail, which fails again after a write error
+                if self.error is None:
+                    self.error = e
+
+    def flush(self):
+        if not self.chunk:
+            return
+
+        compressed = zlib.compress(self.chunk)
+        self.file.write(SIZE.pack(len(compressed)))
+        self.file.write(compressed)
+        self.chunk.clear()
+
+
+class ReplayReader:
+    def __init__(self, path: str):
+        self.path = path
+        records = self.records()
+        self.config = next(records, None)
+        records.close()
+        if self.config is None:
+            raise ReplayError(f'{self.path} has no game config')
+
+    def records(self) -> Iterator[dict]:
+        with open(self.path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ReplayError(f'{self.path} is not a replay')
+
+            while header := file.read(SIZE.size):
+                (compressed_size,) = SIZE.unpack(header)
+                chunk = zlib.decompress(file.read(compressed_size))
+
+                offset = 0
+                while offset < len(chunk):
+                    (size,) = SIZE.unpack_from(chunk, offset)
+                    offset += SIZE.size
+                    yield json.loads(chunk[offset:offset + size])
+                    offset += size
+
+    def ticks(self) -> Iterator[dict]:
+        records = self.records()
+        next(records)
+        yield from records
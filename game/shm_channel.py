@@ -0,0 +1,65 @@
+import os
+from multiprocessing import shared_memory
+
+from strategies.shm_channel import ENV_VARIABLE, LAYOUT, RING, Ring, make_signal
+
+
+# runner side of the shared memory channel, the rings and signals are the ones of strategies/shm_channel.py.
+# the strategy process gets child_fds() and child_env() and attaches to the segment with connect()
+class ChannelFull(Exception):
+    pass
+
+
+class Channel:
+    def __init__(self, states_capacity: int, commands_capacity: int):
+        size = LAYOUT.size + 2 * RING.size + states_capacity + commands_capacity
+        self.memory = shared_memory.SharedMemory(create=True, size=size)
+        buffer = self.memory.buf
+        buffer[:LAYOUT.size + RING.size] = bytes(LAYOUT.size + RING.size)
+        LAYOUT.pack_into(buffer, 0, states_capacity, commands_capacity)
+        self.states = Ring(buffer, LAYOUT.size, states_capacity)
+        commands_offset = LAYOUT.size + RING.size + states_capacity
+        buffer[commands_offset:commands_offset + RING.size] = bytes(RING.size)
+        self.commands = Ring(buffer, commands_offset, commands_capacity)
+
+        self.states_signal = make_signal()
+        self.commands_signal = make_signal()
+        # the runner only collects commands signals when the event loop reports the fd readable
+        os.set_blocking(self.commands_signal.wait_fd, False)
+        # commands counted by the signal and not received yet
+        self.pending = 0
+
+    def child_fds(self) -> tuple[int, int]:
+        return self.states_signal.wait_fd, self.commands_signal.notify_fd
+
+    def child_env(self) -> dict[str, str]:
+        counter = 'eventfd' if self.states_signal.counter else 'pipe'
+        return {ENV_VARIABLE: f'{self.memory.name},{self.states_signal.wait_fd},'
+                              f'{self.commands_signal.notify_fd},{counter}'}
+
+    def send(self, message: bytes):
+        if not self.states.write(message):
+            raise ChannelFull(f'Message of {len(message)} bytes does not fit into the free space of the ring')
+        self.states_signal.notify()
+        self.commands.release()
+
+    def collect_signals(self):
+        try:
+            self.pending += self.commands_signal.wait()
+        except BlockingIOError:
+            return
+        self.commands.release()
+
+    def receive(self) -> bytes | None:
+        if not self.pending:
+            return None
+        self.pending -= 1
+        return self.commands.read()
+
+    def close(self):
+        self.states = self.commands = None
+        for signal in (self.states_signal, self.commands_signal):
+            for fd in {signal.wait_fd, signal.notify_fd}:
+                os.close(fd)
+        self.memory.close()
+        self.memory.unlink()
@@ -0,0 +1,94 @@
+import json
+
+from game.game import Game
+
+
+# %r formats ints and finite floats exactly like json.dumps, rows with nan or infinity fall back to json.dumps
+PLAYER_FIELDS = ('id', 'score', 'speed', 'position_x', 'position_y', 'hit_score', 'bullet_count',
+                 'shot_timeout', 'invulnerability_timeout', 'dash', 'dash_cooldown', 'items')
+PLAYER_TEMPLATE = ('{"id": %r, "score": %r, "speed": %r, "position_x": %r, "position_y": %r, "hit_score": %r, '
+                   '"bullet_count": %r, "shot_timeout": %r, "invulnerability_timeout": %r, "dash": %r, '
+                   '"dash_cooldown": %r, "items": %r}')
+BULLET_FIELDS = ('player_id', 'position_x', 'position_y', 'velocity_x', 'velocity_y')
+BULLET_TEMPLATE = '{"player_id": %r, "position_x": %r, "position_y": %r, "velocity_x": %r, "velocity_y": %r}'
+CHAINSAW_POSITION_TEMPLATE = '{"position_x": %r, "position_y": %r, '
+CHAINSAW_TARGET_TEMPLATE = '"target_index": %r, "target_x": %r, "target_y": %r, "radius": %r}'
+ITEM_FIELDS = ('id', 'position_x', 'position_y')
+ITEM_TEMPLATE = '{"id": %r, "position_x": %r, "position_y": %r}'
+
+
+def is_finite(*values) -> bool:
+    # inf - inf and nan - nan are nan, which is not equal to 0
+    return sum(values) * 0 == 0
+
+
+def same_row(cached: tuple, row: tuple) -> bool:
+    # 64 == 64.0 but json writes them differently, so types have to match too
+    return cached == row and all(type(a) is type(b) for a, b in zip(cached, row))
+
+
+def format_row(template: str, fields: tuple, row: tuple) -> str:
+    if is_finite(*row):
+        return template % row
+
+    return json.dumps(dict(zip(fields, row)))
+
+
+class StateSerializer:
+    # writes the same bytes as json.dumps(game.get_state()) without building the state dict.
+    # fragments of unchanged players and items and the static part of chainsaws are reused
+    def __init__(self):
+        self.players_cache = {}
+        self.chainsaw_targets_cache = {}
+        self.items_key = None
+        self.items_fragment = '[]'
+
+    def serialize(self, game: Game) -> str:
+        return (f'{{"ticks": {game.ticks!r}, "players": {self.players(game)}, "bullets": {self.bullets(game)}, '
+                f'"chainsaws": {self.chainsaws(game)}, "items": {self.items(game)}}}')
+
+    def players(self, game: Game) -> str:
+        fragments = []
+        for player in game.players:
+            weapon = player.weapon
+            movement = player.movement
+            row = (player.id, player.score, movement.speed, movement.position.x, movement.position.y,
+                   weapon.hit_score, weapon.bullet_count, weapon.shot_cooldown.ticks, player.invulnerability.ticks,
+                   player.dash.ticks, player.dash_cooldown.ticks, [item.id for item in player.items])
+
+            cached = self.players_cache.get(player.id)
+            if cached is None or not same_row(cached[0], row):
+                if is_finite(*row[:-1]):
+                    fragment = PLAYER_TEMPLATE % row
+                else:
+                    fragment = json.dumps(dict(zip(PLAYER_FIELDS, row)))
+                cached = self.players_cache[player.id] = (row, fragment)
+
+            fragments.append(cached[1])
+
+        return f'[{", ".join(fragments)}]'
+
+    def bullets(self, game: Game) -> str:
+        return f'[{", ".join([format_row(BULLET_TEMPLATE, BULLET_FIELDS, row) for row in game.get_bullet_rows()])}]'
+
+    def chainsaws(self, game: Game) -> str:
+        fragments = []
+        for index, chainsaw in enumerate(game.chainsaws):
+            # targets and radius come from the config and never change for the same target index
+            target = self.chainsaw_targets_cache.get((index, chainsaw.target_index))
+            if target is None:
+                target = CHAINSAW_TARGET_TEMPLATE % (chainsaw.target_index, chainsaw.target.x, chainsaw.target.y,
+                                                     chainsaw.radius)
+                self.chainsaw_targets_cache[(index, chainsaw.target_index)] = target
+
+            fragments.append(CHAINSAW_POSITION_TEMPLATE % (chainsaw.position.x, chainsaw.position.y) + target)
+
+        return f'[{", ".join(fragments)}]'
+
+    def items(self, game: Game) -> str:
+        key = tuple((item.id, item_position.x, item_position.y) for item_position, item in game.items.items())
+        if key != self.items_key:
+            self.items_key = key
+            self.items_fragment = f'[{", ".join([format_row(ITEM_TEMPLATE, ITEM_FIELDS, row) for row in key])}]'
+
+        return self.items_fragment
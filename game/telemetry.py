@@ -0,0 +1,94 @@
+import json
+
+
+# values are bucketed by their highest SUB_BUCKET_BITS + 1 bits: exact below 32, otherwise within 1/16.
+# a histogram of non-negative ints up to 2**64 never has more than about 1000 buckets
+SUB_BUCKET_BITS = 4
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Histogram:
+    def __init__(self):
+        # lower bound of a bucket -> count
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value: int):
+        shift = max(value.bit_length() - SUB_BUCKET_BITS - 1, 0)
+        bucket = value >> shift << shift
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> int | None:
+        # lower bound of the bucket holding the value, clamped to the recorded range
+        if not self.count:
+            return None
+
+        rank = percent / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(max(bucket, self.min), self.max)
+        return self.max
+
+    def to_json(self) -> dict:
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            **{f'p{percent:g}': self.percentile(percent) for percent in PERCENTILES},
+            'buckets': sorted(self.buckets.items()),
+        }
+
+
+class ClientTelemetry:
+    def __init__(self):
+        # time to hand the state to the client, for a stream client until it is buffered or drained
+        self.send_latency_ns = Histogram()
+        # from the end of sending the state to receiving the command
+        self.think_time_ns = Histogram()
+        self.state_size = Histogram()
+        self.command_size = Histogram()
+        self.disconnect_reason = None
+
+    def to_json(self) -> dict:
+        return {
+            'send_latency_ns': self.send_latency_ns.to_json(),
+            'think_time_ns': self.think_time_ns.to_json(),
+            'state_size': self.state_size.to_json(),
+            'command_size': self.command_size.to_json(),
+            'disconnect_reason': self.disconnect_reason,
+        }
+
+
+class Telemetry:
+    # per client measurements of a match, written as JSON to path by close
+    def __init__(self, path: str):
+        self.path = path
+        self.tick_time_ns = Histogram()
+        self.clients = {}
+
+    def client(self, client_id: int) -> ClientTelemetry:
+        if client_id not in self.clients:
+            self.clients[client_id] = ClientTelemetry()
+        return self.clients[client_id]
+
+    def to_json(self) -> dict:
+        return {
+            'tick_time_ns': self.tick_time_ns.to_json(),
+            'clients': {str(client_id): client.to_json() for client_id, client in sorted(self.clients.items())},
+        }
+
+    def close(self):
+        with open(self.path, 'w') as file:
+            json.dump(self.to_json(), file, indent=1)
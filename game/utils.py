@@ -1,17 +1,48 @@
 from __future__ import annotations
+from functools import lru_cache
 import math
+import sys
 
 
 def is_outside_box(x: float, y: float, width: float, height: float) -> bool:
     return x < 0 or x > width or y < 0 or y > height
 
 
+@lru_cache(maxsize=None)
+def squared_reach(reach: float) -> float:
+    # largest float d2 with math.sqrt(d2) < reach, so that d2 <= squared_reach(reach) gives exactly
+    # the same answer as the distance comparison without taking the square root
+    if not reach > 0:
+        return -1.0
+
+    below = math.nextafter(reach, 0.0)
+    threshold = min(below * below, sys.float_info.max)
+    while math.sqrt(threshold) > below:
+        threshold = math.nextafter(threshold, 0.0)
+    while math.sqrt(math.nextafter(threshold, math.inf)) <= below:
+        threshold = math.nextafter(threshold, math.inf)
+
+    return threshold
+
+
 def circles_collide(center1: Vec, center2: Vec, r1: float, r2: float) -> bool:
-    return Vec.distance(center1, center2) < r1 + r2
+    return (center1.x - center2.x)**2 + (center1.y - center2.y)**2 <= squared_reach(r1 + r2)
+
+
+def segment_circle_collide(start: Vec, end: Vec, center: Vec, r1: float, r2: float) -> bool:
+    # circle r1 moving from start to end against a still circle r2, a zero length step is circles_collide
+    dx = end.x - start.x
+    dy = end.y - start.y
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return circles_collide(start, center, r1, r2)
+
+    t = max(0.0, min(1.0, ((center.x - start.x) * dx + (center.y - start.y) * dy) / length_sq))
+    return (start.x + t * dx - center.x)**2 + (start.y + t * dy - center.y)**2 <= squared_reach(r1 + r2)
 
 
 def point_in_circle(p: Vec, c: Vec, r: float) -> bool:
-    return Vec.distance(p, c) < r
+    return (p.x - c.x)**2 + (p.y - c.y)**2 <= squared_reach(r)
 
 
 class Vec:
@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from game.chainsaw import Chainsaw
+from game.items import WEAPON_ITEM_CLASSES, CrownItem, ShotgunItem, SniperRifleItem, PistolItem
+from config import GameConfig
+
+
+# action columns of VectorGame.step, nan in move or shot means no such action
+MOVE_X, MOVE_Y, SHOT_X, SHOT_Y, DASH, PICK_WEAPON = range(6)
+ACTION_SIZE = 6
+
+EMPTY = -1
+SHOTGUN_SPREAD = math.pi / 24
+
+
+class VectorGame:
+    # K independent matches stepped in lockstep, every player attribute is a (K, N) array and bullets
+    # are (K, B) arrays with an alive mask. Rules and phase order follow game.game.Game.tick, but the item
+    # spawn randomness comes from its own generator, so matches don't replay Game tick for tick.
+    # Chainsaws don't depend on players, so in lockstep they are the same in every match and stored once
+    def __init__(self, games: int, game_config: GameConfig, seed=None):
+        if np is None:
+            raise RuntimeError('NumPy is required for the vector game')
+
+        self.config = game_config
+        self.games = games
+        self.rng = np.random.default_rng(seed)
+
+        players = self.config.players
+        self.players_count = len(players.spawns)
+        self.spawns = np.array([(spawn.position.x, spawn.position.y) for spawn in players.spawns], dtype=np.float64)
+
+        # weapon parameters indexed by item id
+        weapons = self.config.items.weapons
+        self.weapon_ids = [ShotgunItem.id, SniperRifleItem.id, PistolItem.id]
+        self.spawn_weapon_ids = np.array([item_class.id for item_class in WEAPON_ITEM_CLASSES])
+        weapon_configs = {ShotgunItem.id: weapons.shotgun, SniperRifleItem.id: weapons.sniper_rifle,
+                          PistolItem.id: weapons.pistol}
+        size = max(weapon_configs) + 1
+        self.hit_score = np.zeros(size)
+        self.initial_bullets = np.zeros(size, dtype=np.int64)
+        self.shot_timeout = np.zeros(size, dtype=np.int64)
+        self.bullet_speed = np.zeros(size)
+        self.shot_offset = np.zeros(size)
+        for weapon_id, weapon_config in weapon_configs.items():
+            self.hit_score[weapon_id] = weapon_config.hit_score
+            self.initial_bullets[weapon_id] = weapon_config.initial_bullets
+            self.shot_timeout[weapon_id] = weapon_config.shot_timeout
+            self.bullet_speed[weapon_id] = weapon_config.bullet_speed
+            self.shot_offset[weapon_id] = weapon_config.shot_offset
+
+        # item slots are the weapon spots followed by the crown spot
+        items = self.config.items
+        self.item_spots = np.array([(spot.x, spot.y) for spot in items.spots] + [(items.crown.spot.x, items.crown.spot.y)],
+                                   dtype=np.float64)
+        self.crown_slot = len(items.spots)
+
+        self.reset()
+
+    def reset(self) -> dict:
+        k, n = self.games, self.players_count
+
+        self.ticks = 0
+        self.chainsaws = [
+            Chainsaw(chainsaw.radius, chainsaw.speed, chainsaw.path)
+            for chainsaw in self.config.chainsaws
+        ]
+
+        self.position = np.broadcast_to(self.spawns, (k, n, 2)).copy()
+        self.direction = np.zeros((k, n, 2))
+        self.has_direction = np.zeros((k, n), dtype=bool)
+        self.speed = np.full((k, n), self.config.players.speed, dtype=np.float64)
+        self.score = np.zeros((k, n))
+
+        self.invulnerability = np.zeros((k, n), dtype=np.int64)
+        self.dash = np.zeros((k, n), dtype=np.int64)
+        self.dash_cooldown = np.zeros((k, n), dtype=np.int64)
+
+        self.weapon = np.full((k, n), PistolItem.id, dtype=np.int64)
+        self.bullet_count = np.full((k, n), self.initial_bullets[PistolItem.id], dtype=np.int64)
+        self.shot_cooldown = np.zeros((k, n), dtype=np.int64)
+        self.has_crown = np.zeros((k, n), dtype=bool)
+
+        self.items = np.empty((k, len(self.item_spots)), dtype=np.int64)
+        self.items[:, :self.crown_slot] = self.rng.choice(self.spawn_weapon_ids, size=(k, self.crown_slot))
+        self.items[:, self.crown_slot] = CrownItem.id
+
+        self.bullet_position = np.zeros((k, 0, 2))
+        self.bullet_velocity = np.zeros((k, 0, 2))
+        self.bullet_owner = np.zeros((k, 0), dtype=np.int64)
+        self.bullet_alive = np.zeros((k, 0), dtype=bool)
+
+        return self.observe()
+
+    def step(self, actions) -> tuple[dict, np.ndarray, bool]:
+        # actions is a (K, N, ACTION_SIZE) array, returns observations, score gained by every player and done
+        actions = np.asarray(actions, dtype=np.float64)
+        score_before = self.score.copy()
+
+        active = self.chainsaw_logic()
+
+        move = ~np.isnan(actions[:, :, MOVE_X]) & ~np.isnan(actions[:, :, MOVE_Y]) & (self.dash == 0)
+        self.direction[move] = actions[:, :, MOVE_X:MOVE_Y + 1][move]
+        self.has_direction |= move
+
+        self.perform_dash(actions[:, :, DASH] > 0.5)
+        self.timeouts()
+        self.move()
+
+        self.item_logic(active, actions[:, :, PICK_WEAPON] > 0.5)
+        self.spawn_item()
+
+        self.score += self.has_crown
+
+        self.bullets_logic(active)
+        self.perform_shots(actions[:, :, SHOT_X:SHOT_Y + 1])
+
+        self.ticks += 1
+
+        done = self.ticks >= self.config.restrictions.max_ticks
+        return self.observe(), self.score - score_before, done
+
+    def observe(self) -> dict:
+        # step updates the state arrays in place, so observations get copies that stay valid when stored
+        return {
+            'ticks': self.ticks,
+            'position': self.position.copy(),
+            'speed': self.speed.copy(),
+            'score': self.score.copy(),
+            'weapon': self.weapon.copy(),
+            'bullet_count': self.bullet_count.copy(),
+            'shot_cooldown': self.shot_cooldown.copy(),
+            'invulnerability': self.invulnerability.copy(),
+            'dash': self.dash.copy(),
+            'dash_cooldown': self.dash_cooldown.copy(),
+            'has_crown': self.has_crown.copy(),
+            'bullet_position': self.bullet_position.copy(),
+            'bullet_velocity': self.bullet_velocity.copy(),
+            'bullet_owner': self.bullet_owner.copy(),
+            'bullet_alive': self.bullet_alive.copy(),
+            'items': self.items.copy(),
+            'chainsaws': np.array([(chainsaw.position.x, chainsaw.position.y) for chainsaw in self.chainsaws]),
+        }
+
+    @staticmethod
+    def distance(position, center):
+        return np.sqrt((position[..., 0] - center[..., 0]) ** 2 + (position[..., 1] - center[..., 1]) ** 2)
+
+    def chainsaw_logic(self):
+        active = self.invulnerability == 0
+
+        players_radius = self.config.players.radius
+        bullet_radius = self.config.items.weapons.bullet_radius
+        for chainsaw in self.chainsaws:
+            chainsaw.move()
+            center = np.array([chainsaw.position.x, chainsaw.position.y])
+
+            collide = active & (self.distance(self.position, center) < players_radius + chainsaw.radius)
+            self.drop_players(collide)
+            active &= ~collide
+
+            self.bullet_alive &= ~(self.distance(self.bullet_position, center) < bullet_radius + chainsaw.radius)
+
+        return active
+
+    def perform_dash(self, dash):
+        dash &= (self.invulnerability == 0) & (self.dash == 0) & (self.dash_cooldown == 0)
+
+        duration = self.config.players.dash.duration
+        self.dash[dash] = duration
+        self.invulnerability[dash] = duration
+        self.speed[dash] += self.config.players.dash.speed_bonus
+
+    def timeouts(self):
+        np.maximum(self.invulnerability - 1, 0, out=self.invulnerability)
+        np.maximum(self.shot_cooldown - 1, 0, out=self.shot_cooldown)
+
+        dashing = self.dash > 0
+        self.dash[dashing] -= 1
+        dash_ended = dashing & (self.dash == 0)
+        self.speed[dash_ended] -= self.config.players.dash.speed_bonus
+        self.dash_cooldown[dash_ended] = self.config.players.dash.cooldown
+
+        np.maximum(self.dash_cooldown - 1, 0, out=self.dash_cooldown)
+
+    def move(self):
+        length = np.sqrt(self.direction[..., 0] ** 2 + self.direction[..., 1] ** 2)
+        unit = np.divide(self.direction, length[..., None], out=np.zeros_like(self.direction),
+                         where=length[..., None] != 0)
+
+        moved = self.position + unit * self.speed[..., None]
+        self.position = np.where(self.has_direction[..., None], moved, self.position)
+        np.clip(self.position[..., 0], 0.0, self.config.arena.width, out=self.position[..., 0])
+        np.clip(self.position[..., 1], 0.0, self.config.arena.height, out=self.position[..., 1])
+
+    def item_logic(self, active, pick):
+        picking = pick & active
+        reach = self.config.players.radius + self.config.items.radius
+        games = np.arange(self.games)
+
+        for slot, spot in enumerate(self.item_spots):
+            item = self.items[:, slot]
+            check_players = active if slot == self.crown_slot else picking
+            collide = check_players & (self.distance(self.position, spot) < reach) & (item != EMPTY)[:, None]
+
+            # item can't be picked up when it collides with multiple players
+            picked = collide.sum(axis=1) == 1
+            player = collide.argmax(axis=1)
+            picked_games = games[picked]
+            picked_players = player[picked]
+
+            if slot == self.crown_slot:
+                self.has_crown[picked_games, picked_players] = True
+            else:
+                self.pick_weapon(picked_games, picked_players, item[picked])
+
+            self.items[picked, slot] = EMPTY
+
+    def spawn_item(self):
+        if self.ticks % self.config.items.spawn_period != 0:
+            return
+
+        empty = self.items[:, :self.crown_slot] == EMPTY
+        keys = np.where(empty, self.rng.random(empty.shape), -1.0)
+        spot = keys.argmax(axis=1)
+        spawn = empty.any(axis=1)
+        weapon = self.rng.choice(self.spawn_weapon_ids, size=self.games)
+
+        self.items[spawn, spot[spawn]] = weapon[spawn]
+
+    def pick_weapon(self, games, players, weapon):
+        same = self.weapon[games, players] == weapon
+
+        refill = same & (self.bullet_count[games, players] != -1)
+        self.bullet_count[games[refill], players[refill]] += self.initial_bullets[weapon[refill]]
+
+        new = ~same
+        games, players, weapon = games[new], players[new], weapon[new]
+        self.weapon[games, players] = weapon
+        self.bullet_count[games, players] = self.initial_bullets[weapon]
+        self.shot_cooldown[games, players] = 0
+
+    def drop_players(self, dropped):
+        if not dropped.any():
+            return
+
+        crown_dropped = (dropped & self.has_crown).any(axis=1)
+        self.items[crown_dropped, self.crown_slot] = CrownItem.id
+        self.has_crown &= ~dropped
+
+        self.invulnerability[dropped] = self.config.players.drop_out_invulnerability_timeout
+        self.position[dropped] = np.broadcast_to(self.spawns, self.position.shape)[dropped]
+
+        games, players = np.nonzero(dropped)
+        self.pick_weapon(games, players, np.full(len(games), PistolItem.id))
+
+    def bullets_logic(self, active):
+        width = self.config.arena.width
+        height = self.config.arena.height
+        x = self.bullet_position[..., 0]
+        y = self.bullet_position[..., 1]
+        self.bullet_alive &= ~((x < 0) | (x > width) | (y < 0) | (y > height))
+
+        reach = self.config.items.weapons.bullet_radius + self.config.players.radius
+        distance = np.sqrt(((self.bullet_position[:, :, None, :] - self.position[:, None, :, :]) ** 2).sum(axis=-1))
+        hits = (self.bullet_alive[:, :, None] & active[:, None, :]
+                & (self.bullet_owner[:, :, None] != np.arange(self.players_count))
+                & (distance < reach))
+
+        # like Game, the newest bullet goes first and hits the last colliding player,
+        # dropped players can't be hit again in the same tick
+        games = np.arange(self.games)
+        moving = self.bullet_alive.copy()
+        active = active.copy()
+        for bullet in np.flatnonzero(hits.any(axis=(0, 2)))[::-1]:
+            candidates = hits[:, bullet, :] & active
+            hit = candidates.any(axis=1)
+            if not hit.any():
+                continue
+
+            player = self.players_count - 1 - candidates[:, ::-1].argmax(axis=1)
+            hit_games = games[hit]
+            owners = self.bullet_owner[hit_games, bullet]
+            self.score[hit_games, owners] += self.hit_score[self.weapon[hit_games, owners]]
+
+            dropped = np.zeros_like(active)
+            dropped[hit_games, player[hit]] = True
+            self.drop_players(dropped)
+            active &= ~dropped
+
+            moving[hit_games, bullet] = False
+            self.bullet_alive[hit_games, bullet] = False
+
+        self.bullet_position += self.bullet_velocity * moving[..., None]
+
+    def perform_shots(self, targets):
+        width = self.config.arena.width
+        height = self.config.arena.height
+        target_x = targets[..., 0]
+        target_y = targets[..., 1]
+        shooting = ~np.isnan(target_x) & ~np.isnan(target_y)
+        # same validation as parsing.Point, comparisons with nan are false
+        shooting &= ~((target_x < 0) | (target_x > width) | (target_y < 0) | (target_y > height))
+        shooting &= (self.invulnerability == 0) & (self.shot_cooldown == 0)
+        if not shooting.any():
+            self.compact_bullets()
+            return
+
+        weapon = self.weapon
+        self.shot_cooldown[shooting] = self.shot_timeout[weapon[shooting]]
+        limited = shooting & (self.bullet_count != -1)
+        last_shot = limited & (self.bullet_count == 1)
+        self.bullet_count[limited] -= 1
+
+        offset = np.nan_to_num(targets) - self.position
+        length = np.sqrt(offset[..., 0] ** 2 + offset[..., 1] ** 2)
+        direction = np.divide(offset, length[..., None], out=np.zeros_like(offset), where=length[..., None] != 0)
+        shot_position = self.position + direction * self.shot_offset[weapon][..., None]
+        speed = self.bullet_speed[weapon][..., None]
+
+        # three bullets per player: straight and the two shotgun ones rotated by the spread
+        k, n = self.games, self.players_count
+        positions = np.repeat(shot_position[:, :, None, :], 3, axis=2)
+        velocities = np.empty((k, n, 3, 2))
+        velocities[:, :, 0] = direction * speed
+        for index, angle in ((1, SHOTGUN_SPREAD), (2, -SHOTGUN_SPREAD)):
+            cos, sin = math.cos(angle), math.sin(angle)
+            rotated = np.stack((direction[..., 0] * cos - direction[..., 1] * sin,
+                                direction[..., 0] * sin + direction[..., 1] * cos), axis=-1)
+            velocities[:, :, index] = rotated * speed
+
+        alive = np.zeros((k, n, 3), dtype=bool)
+        alive[:, :, 0] = shooting
+        alive[:, :, 1:] = (shooting & (weapon == ShotgunItem.id))[..., None]
+
+        self.bullet_position = np.concatenate((self.bullet_position, positions.reshape(k, n * 3, 2)), axis=1)
+        self.bullet_velocity = np.concatenate((self.bullet_velocity, velocities.reshape(k, n * 3, 2)), axis=1)
+        self.bullet_owner = np.concatenate((self.bullet_owner, np.repeat(np.arange(n), 3)[None, :].repeat(k, 0)),
+                                           axis=1)
+        self.bullet_alive = np.concatenate((self.bullet_alive, alive.reshape(k, n * 3)), axis=1)
+
+        # the last bullet is gone, player gets a pistol back
+        games, players = np.nonzero(last_shot)
+        self.pick_weapon(games, players, np.full(len(games), PistolItem.id))
+
+        self.compact_bullets()
+
+    def compact_bullets(self):
+        # alive bullets of every match are moved to the front keeping their order, columns dead everywhere are cut
+        order = np.argsort(~self.bullet_alive, axis=1, kind='stable')
+        width = int(self.bullet_alive.sum(axis=1).max(initial=0))
+        order = order[:, :width]
+
+        self.bullet_alive = np.take_along_axis(self.bullet_alive, order, axis=1)
+        self.bullet_owner = np.take_along_axis(self.bullet_owner, order, axis=1)
+        self.bullet_position = np.take_along_axis(self.bullet_position, order[..., None], axis=1)
+        self.bullet_velocity = np.take_along_axis(self.bullet_velocity, order[..., None], axis=1)
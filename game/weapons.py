@@ -19,13 +19,19 @@ class NoAmmoError(Exception):
 # TODO purpose of created_at is unclear
 class Bullet:
     def __init__(self, player: 'Player', position: Vec, direction: Vec, speed: float, created_at: int):
+        # assigned by the game when the bullet is fired
+        self.id = None
         self.player = player
-        self.position = position
+        # position is owned and updated in place, bullets of one shot start at the same point
+        self.position = Vec(position.x, position.y)
         self.velocity = direction * speed
         self.created_at = created_at
 
     def move(self):
-        self.position = self.position + self.velocity
+        position = self.position
+        velocity = self.velocity
+        position.x += velocity.x
+        position.y += velocity.y
 
 
 class Weapon(Attachment):
@@ -64,10 +70,19 @@ class Weapon(Attachment):
         return self.create_bullets(target, tick), is_last_shot
 
     def get_shot_direction(self, target: Vec) -> Vec:
-        return Vec.unit(target - self.player.movement.position)
+        # Vec.unit(target - position) with one allocation
+        position = self.player.movement.position
+        dx = target.x - position.x
+        dy = target.y - position.y
+        length = math.sqrt(dx**2 + dy**2)
+        if length == 0:
+            return Vec(0.0, 0.0)
+
+        return Vec(dx / length, dy / length)
 
     def get_shot_position(self, direction: Vec) -> Vec:
-        return self.player.movement.position + direction * self.shot_offset
+        position = self.player.movement.position
+        return Vec(position.x + direction.x * self.shot_offset, position.y + direction.y * self.shot_offset)
 
     def create_bullets(self, target: Vec, tick: int) -> list[Bullet]:
         raise NotImplementedError
@@ -2,7 +2,6 @@ from __future__ import annotations
 
 from typing import Tuple, Optional
 
-import config
 from game.game import Game
 from game.utils import Vec, is_outside_box
 
@@ -36,7 +35,66 @@ def parse_command(game: Game, player_id: int, command: dict) -> \
     return move, dash, shot, pick_weapon
 
 
+def new_action(cls, player):
+    # an action with already validated arguments, its constructor would check them again
+    action = object.__new__(cls)
+    action.player = player
+    return action
+
+
+class CommandParser:
+    # parse_command compiled for one game: the same validation as the Action constructors but without
+    # kwargs, exceptions or a scan of the players for every action.
+    # a move or a shot is a dict with exactly its two fields, which ** requires too
+    def __init__(self, game: Game):
+        self.game = game
+        self.arena_width = game.arena_width
+        self.arena_height = game.arena_height
+        # player_id -> player, resolved on the first command of a client
+        self.players = {}
+
+    def parse(self, player_id: int, command) -> \
+            Tuple[Optional[Move], Optional[Dash], Optional[Shot], Optional[Boolean]]:
+        if not isinstance(command, dict):
+            return None, None, None, None
+
+        if player_id not in self.players:
+            self.players[player_id] = self.game.get_player_by_id(player_id)
+        player = self.players[player_id]
+
+        move = None
+        value = command.get('move')
+        if isinstance(value, dict) and len(value) == 2 and 'direction_x' in value and 'direction_y' in value:
+            direction_x = value['direction_x']
+            direction_y = value['direction_y']
+            if isinstance(direction_x, (int, float)) and isinstance(direction_y, (int, float)):
+                move = new_action(Move, player)
+                move.direction = Vec(direction_x, direction_y)
+
+        shot = None
+        value = command.get('shot')
+        if isinstance(value, dict) and len(value) == 2 and 'point_x' in value and 'point_y' in value:
+            point_x = value['point_x']
+            point_y = value['point_y']
+            if isinstance(point_x, (int, float)) and isinstance(point_y, (int, float)) and \
+                    not is_outside_box(point_x, point_y, self.arena_width, self.arena_height):
+                shot = new_action(Shot, player)
+                shot.point = Vec(point_x, point_y)
+
+        pick_weapon = new_action(Boolean, player) if command.get('pick_weapon') is True else None
+        dash = new_action(Dash, player) if command.get('dash') is True else None
+
+        return move, dash, shot, pick_weapon
+
+    def parse_commands(self, commands: list) -> list:
+        # (player_id, command) pairs of one tick, the actions come back in the same order
+        parse = self.parse
+        return [parse(player_id, command) for player_id, command in commands]
+
+
 class Action:
+    __slots__ = ('player',)
+
     def __init__(self, game: Game, player_id: int):
         self.player = game.get_player_by_id(player_id)
 
@@ -45,6 +103,8 @@ class Action:
 
 
 class Direction(Action):
+    __slots__ = ('direction',)
+
     def __init__(self, direction_x, direction_y, *args, **kwargs):
         if not isinstance(direction_x, (int, float)) or not isinstance(direction_y, (int, float)):
             raise InvalidAction
@@ -54,19 +114,23 @@ class Direction(Action):
 
 
 class Point(Action):
+    __slots__ = ('point',)
+
     def __init__(self, game, player_id, point_x, point_y):
         if not isinstance(point_x, (int, float)) or not isinstance(point_y, (int, float)):
             raise InvalidAction
 
         super().__init__(game, player_id)
 
-        if is_outside_box(point_x, point_y, config.global_config.arena.width, config.global_config.arena.height):
+        if is_outside_box(point_x, point_y, game.arena_width, game.arena_height):
             raise InvalidAction
 
         self.point = Vec(point_x, point_y)
 
 
 class Boolean(Action):
+    __slots__ = ()
+
     def __init__(self, game, player_id, value):
         if not isinstance(value, bool) or value is not True:
             raise InvalidAction
@@ -75,15 +139,21 @@ class Boolean(Action):
 
 
 class Move(Direction):
+    __slots__ = ()
+
     def apply(self):
         self.player.set_direction(self.direction)
 
 
 class Shot(Point):
+    __slots__ = ()
+
     def apply(self, tick):
         return self.player.shot(self.point, tick)
 
 
 class Dash(Boolean):
+    __slots__ = ()
+
     def apply(self):
         return self.player.perform_dash()
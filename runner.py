@@ -1,40 +1,91 @@
 import asyncio
 import json
+import os
 import signal
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import argparse
 from game.game import Game
 from game.game_loop import GameLoop
-from clients import ProcessClient, TCPClient
-from config import set_global_config, GameConfig
-import config
+from game.replay import ReplayWriter
+from game.telemetry import Telemetry
+from game.profiling import TickProfiler, SAMPLE_MODES
+from game.delta import DeltaEncoder
+from game.binary_codec import BinaryStateEncoder
+from clients import TCPClient, InProcessClient, get_process_clients, get_shm_clients, load_strategy
+from config import GameConfig
+from tournament import PAIRINGS, Leaderboard, make_pairings, play_match
 
 
-async def get_process_clients(strategies):
-    processes = []
-    for strategy in strategies:
-        process = asyncio.create_subprocess_shell(strategy,
-                                                  stdin=asyncio.subprocess.PIPE,
-                                                  stdout=asyncio.subprocess.PIPE,
-                                                  stderr=asyncio.subprocess.DEVNULL)
-        processes.append(process)
+def get_replay(path, game_config: GameConfig):
+    if path is None:
+        return None
 
-    processes = await asyncio.gather(*processes)
-    clients = [ProcessClient(process) for process in processes]
-    return clients
+    return ReplayWriter(path, game_config.raw_config)
+
+
+def get_telemetry(path):
+    if path is None:
+        return None
+
+    return Telemetry(path)
+
+
+def make_game(game_config: GameConfig, args) -> Game:
+    return Game(game_config, bullet_pool=args.bullet_pool, swept_collisions=args.swept_collisions,
+                profiler=get_profiler(args))
+
+
+def get_profiler(args):
+    if not args.profile_phases and not args.profile_sample and args.tick_budget is None:
+        return None
+
+    tick_budget_ns = None if args.tick_budget is None else int(args.tick_budget * 1e6)
+    return TickProfiler(args.profile_phases, args.profile_sample, args.profile_mode, tick_budget_ns)
+
+
+def get_state_encoder(args):
+    if args.delta_states is not None:
+        return DeltaEncoder(args.delta_states)
+    if args.binary_states:
+        return BinaryStateEncoder()
+
+    return None
 
 
 class Server:
-    def __init__(self, game: Game, host: str, port: str):
-        self.clients = []
-        self.game = game
+    # lobby on one port: waiting clients are grouped into matches as soon as there are enough of them and
+    # every match runs its own Game, state encoder and GameLoop concurrently on the same event loop
+    def __init__(self, game_config: GameConfig, game_factory, host: str, port: str, replay_path: str = None,
+                 state_encoder_factory=None, matches: int = 1, telemetry_path: str = None):
+        self.game_config = game_config
+        self.players_count = len(game_config.players.spawns)
+        # game_factory(game_config) creates a fresh Game for every match
+        self.game_factory = game_factory
+        self.state_encoder_factory = state_encoder_factory
+        self.replay_path = replay_path
+        self.telemetry_path = telemetry_path
         self.host = host
         self.port = port
+        # 0 plays matches until interrupted
+        self.matches = matches
         self.server = None
 
+        self.waiting = []
+        self.started_matches = 0
+        self.finished_matches = 0
+        self.match_tasks = set()
+        self.game_loops = set()
+
+    def stop(self):
+        # stops accepting clients and ends the running matches after their current tick
+        self.server.close()
+        for game_loop in self.game_loops:
+            game_loop.stop()
+
     async def run(self):
         self.server = await asyncio.start_server(self.on_connect, self.host, self.port)
-        signal.signal(signal.SIGINT, self.server.close)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGINT, self.stop)
 
         async with self.server:
             try:
@@ -42,67 +93,210 @@ class Server:
             except asyncio.exceptions.CancelledError:
                 pass
 
-    async def on_connect(self, reader, writer):
-        # TODO close server if client disconnected
-        if len(self.clients) < len(config.global_config.players.spawns):
-            self.clients.append(TCPClient(reader, writer))
+            if self.match_tasks:
+                await asyncio.gather(*self.match_tasks)
 
-            if len(self.clients) == len(config.global_config.players.spawns):
-                game_loop = GameLoop(self.game, self.clients)
-                await game_loop.play()
+            for client in self.waiting:
+                client.disconnect()
 
-                self.server.close()
-        else:
+    async def on_connect(self, reader, writer):
+        if self.matches and self.started_matches == self.matches:
             writer.close()
+            return
+
+        self.waiting.append(TCPClient(reader, writer, self.game_config))
+        # clients that disconnected while waiting don't get into a match
+        self.waiting = [client for client in self.waiting if client.is_connected()]
+        if len(self.waiting) < self.players_count:
+            return
+
+        clients = self.waiting[:self.players_count]
+        self.waiting = self.waiting[self.players_count:]
+
+        task = asyncio.create_task(self.play_match(self.started_matches, clients))
+        self.match_tasks.add(task)
+        task.add_done_callback(self.match_tasks.discard)
+        self.started_matches += 1
+
+    async def play_match(self, match_id: int, clients: list[TCPClient]):
+        game = self.game_factory(self.game_config)
+        replay_path = self.replay_path
+        if replay_path is not None and self.matches != 1:
+            replay_path = f'{replay_path}.{match_id}'
+        telemetry_path = self.telemetry_path
+        if telemetry_path is not None and self.matches != 1:
+            telemetry_path = f'{telemetry_path}.{match_id}'
+
+        state_encoder = self.state_encoder_factory() if self.state_encoder_factory is not None else None
+        game_loop = GameLoop(game, clients, get_replay(replay_path, game.config), state_encoder,
+                             get_telemetry(telemetry_path))
+        # disconnected clients leave the game loop, peaks are reported for all of them
+        clients_by_id = dict(game_loop.clients)
+        self.game_loops.add(game_loop)
+        try:
+            await game_loop.play()
+        finally:
+            self.game_loops.discard(game_loop)
+            for client_id in list(game_loop.clients):
+                game_loop.disconnect_client(client_id)
+
+        scores = ' '.join(f'{player.id}={player.score}' for player in game.players)
+        print(f'match {match_id}: {scores}', flush=True)
+        buffered = ' '.join(f'{client_id}={client.peak_buffered_bytes}'
+                            for client_id, client in sorted(clients_by_id.items()))
+        print(f'match {match_id} peak unsent bytes: {buffered}', flush=True)
 
+        self.finished_matches += 1
+        if self.matches and self.finished_matches == self.matches:
+            self.server.close()
 
-def run_server(game: Game, args):
-    server = Server(game, args.host, args.port)
+
+def run_server(game_config: GameConfig, args):
+    server = Server(game_config, lambda config: make_game(config, args), args.host, args.port, args.replay,
+                    lambda: get_state_encoder(args), args.matches, args.telemetry)
 
     loop = asyncio.get_event_loop()
     loop.run_until_complete(server.run())
 
 
 def run_local(game: Game, args):
-    if len(args.strategies) != len(config.global_config.players.spawns):
+    if len(args.strategies) != len(game.config.players.spawns):
         return
 
     loop = asyncio.get_event_loop()
-    clients = loop.run_until_complete(get_process_clients(args.strategies))
+    get_clients = get_shm_clients if args.shm else get_process_clients
+    clients = loop.run_until_complete(get_clients(args.strategies, game.config))
 
-    game_loop = GameLoop(game, clients)
+    game_loop = GameLoop(game, clients, get_replay(args.replay, game.config), get_state_encoder(args),
+                         get_telemetry(args.telemetry))
     signal.signal(signal.SIGINT, game_loop.stop)
 
+    try:
+        loop.run_until_complete(game_loop.play())
+    finally:
+        for client_id in list(game_loop.clients):
+            game_loop.disconnect_client(client_id)
+
+
+def run_in_process(game: Game, args):
+    if len(args.strategies) != len(game.config.players.spawns):
+        return
+
+    clients = [InProcessClient(load_strategy(strategy)) for strategy in args.strategies]
+
+    game_loop = GameLoop(game, clients, get_replay(args.replay, game.config), telemetry=get_telemetry(args.telemetry))
+    signal.signal(signal.SIGINT, game_loop.stop)
+
+    loop = asyncio.get_event_loop()
     loop.run_until_complete(game_loop.play())
 
 
+def run_tournament(game_config: GameConfig, args):
+    players_count = len(game_config.players.spawns)
+    if len(args.strategies) < players_count:
+        return
+
+    pairings = make_pairings(args.strategies, players_count, args.matches, args.pairing, args.seed)
+    leaderboard = Leaderboard()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(play_match, match_id, game_config.raw_config, strategies, args.in_process,
+                            args.bullet_pool, args.replay and f'{args.replay}.{match_id}', args.swept_collisions,
+                            args.reuse_processes, args.telemetry and f'{args.telemetry}.{match_id}')
+            for match_id, strategies in enumerate(pairings)
+        ]
+
+        for future in as_completed(futures):
+            match_id, results = future.result()
+            leaderboard.add_match(results)
+            scores = ' '.join(f'{strategy}={score}' for strategy, score in results)
+            print(f'match {match_id}: {scores}', flush=True)
+
+    print(leaderboard.format())
+
+
 def parsing():
     # TODO proper usage
     parser = argparse.ArgumentParser()
 
     default_parser = argparse.ArgumentParser()
     default_parser.add_argument('--config', type=argparse.FileType(mode='r'), help='Path to the config', required=True)
+    default_parser.add_argument('--bullet-pool', action='store_true',
+                                help='Store bullets in NumPy arrays (requires numpy)')
+    default_parser.add_argument('--swept-collisions', action='store_true',
+                                help='Check bullets and chainsaws along their whole step, e.g. with action_repeat')
+    state_encoding_group = default_parser.add_mutually_exclusive_group()
+    state_encoding_group.add_argument('--delta-states', type=int, default=None, metavar='KEYFRAME_PERIOD',
+                                      help='Send state deltas with a full keyframe every KEYFRAME_PERIOD ticks')
+    state_encoding_group.add_argument('--binary-states', action='store_true',
+                                      help='Send states and receive commands in the binary format')
+    default_parser.add_argument('--replay', type=str, default=None,
+                                help='Path of the replay file, tournament appends match id to it')
+    default_parser.add_argument('--telemetry', type=str, default=None,
+                                help='Path of the JSON file with per-client timings and sizes, '
+                                     'tournament appends match id to it')
+
+    # the tournament builds its games in worker processes and is not profiled
+    profiling_parser = argparse.ArgumentParser(add_help=False)
+    profiling_parser.add_argument('--profile-phases', action='store_true',
+                                  help='Time every phase of the tick and print the breakdown after the match')
+    profiling_parser.add_argument('--profile-sample', type=int, default=0, metavar='N',
+                                  help='Profile every N-th tick with --profile-mode')
+    profiling_parser.add_argument('--profile-mode', choices=SAMPLE_MODES, default='cprofile')
+    profiling_parser.add_argument('--tick-budget', type=float, default=None, metavar='MS',
+                                  help='Print the phase breakdown of every tick that takes longer than MS')
 
     subparsers = parser.add_subparsers(dest='mode', required=True)
-    local_parser = subparsers.add_parser('local', parents=[default_parser], add_help=False)
+    local_parser = subparsers.add_parser('local', parents=[default_parser, profiling_parser], add_help=False)
     local_parser.add_argument('strategies', type=str,
                               help='Paths of strategies',
                               nargs='+')
+    local_parser.add_argument('--shm', action='store_true',
+                              help='Talk to strategies through shared memory, see strategies/shm_channel.py')
 
-    server_parser = subparsers.add_parser('server', parents=[default_parser], add_help=False)
+    in_process_parser = subparsers.add_parser('inprocess', parents=[default_parser, profiling_parser],
+                                              add_help=False)
+    in_process_parser.add_argument('strategies', type=str,
+                                   help='Module paths of in-process strategies, e.g. strategies.random_strategy:Strategy',
+                                   nargs='+')
+
+    tournament_parser = subparsers.add_parser('tournament', parents=[default_parser], add_help=False)
+    tournament_parser.add_argument('strategies', type=str,
+                                   help='Strategy pool, commands or module paths with --in-process',
+                                   nargs='+')
+    tournament_parser.add_argument('--pairing', choices=PAIRINGS, default='round-robin')
+    tournament_parser.add_argument('--matches', type=int, required=True)
+    tournament_parser.add_argument('--workers', type=int, default=os.cpu_count())
+    tournament_parser.add_argument('--seed', type=int, default=None, help='Seed of the random pairing')
+    tournament_parser.add_argument('--reuse-processes', type=int, default=1, metavar='MATCHES',
+                                   help='Keep strategy processes of a worker alive for up to MATCHES matches, '
+                                        'following matches start with a new game message')
+    tournament_parser.add_argument('--in-process', action='store_true',
+                                   help='Strategies are module paths of in-process strategies')
+
+    server_parser = subparsers.add_parser('server', parents=[default_parser, profiling_parser],
+                                          add_help=False)
     server_parser.add_argument('--host', type=str, required=True)
     server_parser.add_argument('--port', type=str, required=True)
+    server_parser.add_argument('--matches', type=int, default=1,
+                               help='Number of matches to host before exiting, 0 runs until interrupted')
 
     return parser.parse_args()
 
 
 if __name__ == '__main__':
     args = parsing()
-    set_global_config(GameConfig(**json.load(args.config)))
-
-    game = Game()
+    game_config = GameConfig(**json.load(args.config))
 
-    if args.mode == 'server':
-        run_server(game, args)
+    if args.mode == 'tournament':
+        run_tournament(game_config, args)
+    elif args.mode == 'server':
+        run_server(game_config, args)
     else:
-        run_local(game, args)
+        game = make_game(game_config, args)
+
+        if args.mode == 'inprocess':
+            run_in_process(game, args)
+        else:
+            run_local(game, args)
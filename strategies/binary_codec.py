@@ -0,0 +1,89 @@
+import struct
+import sys
+
+
+# strategy side of the binary protocol, used when the config has "state_encoding": "binary".
+# self-contained so it can be copied next to a strategy, layouts must match game/binary_codec.py
+FRAME = struct.Struct('<I')
+HEADER = struct.Struct('<IHIHH')
+PLAYER = struct.Struct('<idddddiiiiiH')
+PLAYER_FIELDS = ('id', 'score', 'speed', 'position_x', 'position_y', 'hit_score', 'bullet_count',
+                 'shot_timeout', 'invulnerability_timeout', 'dash', 'dash_cooldown')
+BULLET = struct.Struct('<qidddd')
+BULLET_FIELDS = ('id', 'player_id', 'position_x', 'position_y', 'velocity_x', 'velocity_y')
+CHAINSAW = struct.Struct('<ddiddd')
+CHAINSAW_FIELDS = ('position_x', 'position_y', 'target_index', 'target_x', 'target_y', 'radius')
+ITEM = struct.Struct('<Bdd')
+ITEM_FIELDS = ('id', 'position_x', 'position_y')
+TIME_BANK = struct.Struct('<d')
+
+COMMAND = struct.Struct('<Bdddd')
+MOVE_FLAG = 1
+SHOT_FLAG = 2
+DASH_FLAG = 4
+PICK_WEAPON_FLAG = 8
+
+
+def decode_state(data: bytes) -> dict:
+    ticks, players_count, bullets_count, chainsaws_count, items_count = HEADER.unpack_from(data)
+    offset = HEADER.size
+
+    players = []
+    for values in PLAYER.iter_unpack(data[offset:offset + players_count * PLAYER.size]):
+        player = dict(zip(PLAYER_FIELDS, values))
+        player['items'] = values[-1]
+        players.append(player)
+    offset += players_count * PLAYER.size
+
+    bullets = [dict(zip(BULLET_FIELDS, values))
+               for values in BULLET.iter_unpack(data[offset:offset + bullets_count * BULLET.size])]
+    offset += bullets_count * BULLET.size
+
+    chainsaws = [dict(zip(CHAINSAW_FIELDS, values))
+                 for values in CHAINSAW.iter_unpack(data[offset:offset + chainsaws_count * CHAINSAW.size])]
+    offset += chainsaws_count * CHAINSAW.size
+
+    items = [dict(zip(ITEM_FIELDS, values))
+             for values in ITEM.iter_unpack(data[offset:offset + items_count * ITEM.size])]
+    offset += items_count * ITEM.size
+
+    # items_count of every player was stored in place of its items
+    for player in players:
+        count = player['items']
+        player['items'] = list(data[offset:offset + count])
+        offset += count
+
+    state = {'ticks': ticks, 'players': players, 'bullets': bullets, 'chainsaws': chainsaws, 'items': items}
+    # only present when the match has restrictions.time_bank
+    if len(data) - offset >= TIME_BANK.size:
+        (state['time_bank'],) = TIME_BANK.unpack_from(data, offset)
+
+    return state
+
+
+def encode_command(move=None, shot=None, dash=False, pick_weapon=False) -> bytes:
+    # move is (direction_x, direction_y), shot is (point_x, point_y)
+    flags = 0
+    direction_x = direction_y = point_x = point_y = 0.0
+    if move is not None:
+        flags |= MOVE_FLAG
+        direction_x, direction_y = move
+    if shot is not None:
+        flags |= SHOT_FLAG
+        point_x, point_y = shot
+    if dash:
+        flags |= DASH_FLAG
+    if pick_weapon:
+        flags |= PICK_WEAPON_FLAG
+
+    return COMMAND.pack(flags, direction_x, direction_y, point_x, point_y)
+
+
+def read_state(stream=sys.stdin.buffer) -> dict:
+    (size,) = FRAME.unpack(stream.read(FRAME.size))
+    return decode_state(stream.read(size))
+
+
+def write_command(stream=sys.stdout.buffer, **command):
+    stream.write(encode_command(**command))
+    stream.flush()
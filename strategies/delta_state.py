@@ -0,0 +1,51 @@
+class DeltaState:
+    # rebuilds full game states from the runner's delta messages (config "state_encoding": "delta").
+    # self-contained so it can be copied next to a strategy
+    def __init__(self):
+        self.state = None
+        self.bullets = {}
+        self.items = {}
+
+    def update(self, message: dict) -> dict:
+        if message['keyframe']:
+            self.state = {name: value for name, value in message.items() if name != 'keyframe'}
+            self.bullets = {bullet['id']: bullet for bullet in self.state['bullets']}
+            self.items = {(item['position_x'], item['position_y']): item for item in self.state['items']}
+        else:
+            self.apply_delta(message)
+
+        self.state['bullets'] = list(self.bullets.values())
+        self.state['items'] = list(self.items.values())
+        return self.state
+
+    def apply_delta(self, delta: dict):
+        elapsed = delta['ticks'] - self.state['ticks']
+        self.state['ticks'] = delta['ticks']
+        if 'time_bank' in delta:
+            self.state['time_bank'] = delta['time_bank']
+
+        players = {player['id']: player for player in self.state['players']}
+        for changed in delta['players']:
+            players[changed['id']].update(changed)
+
+        for changed in delta['chainsaws']:
+            index = changed.pop('index')
+            self.state['chainsaws'][index].update(changed)
+
+        for bullet_id in delta['bullets']['removed']:
+            del self.bullets[bullet_id]
+
+        # surviving bullets move by their velocity once per tick, repeated additions match the runner exactly
+        for bullet in self.bullets.values():
+            for _ in range(elapsed):
+                bullet['position_x'] += bullet['velocity_x']
+                bullet['position_y'] += bullet['velocity_y']
+
+        for bullet in delta['bullets']['spawned']:
+            self.bullets[bullet['id']] = bullet
+
+        for spot in delta['items']['disappeared']:
+            del self.items[tuple(spot)]
+
+        for item in delta['items']['appeared']:
+            self.items[(item['position_x'], item['position_y'])] = item
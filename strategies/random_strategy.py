@@ -0,0 +1,21 @@
+import random
+
+from parsing import Move, Shot
+
+
+class Strategy:
+    # in-process strategy for runner.py inprocess, called every tick with a read-only game view
+    def __init__(self):
+        self.random = random.Random()
+
+    def __call__(self, game, player_id):
+        move = Move(self.random.uniform(-1, 1), self.random.uniform(-1, 1), game=game, player_id=player_id)
+
+        shot = None
+        player = game.get_player_by_id(player_id)
+        if player.weapon.shot_cooldown.is_over() and player.invulnerability.is_over():
+            shot = Shot(game, player_id,
+                        self.random.uniform(0, game.arena_width),
+                        self.random.uniform(0, game.arena_height))
+
+        return move, None, shot, None
@@ -0,0 +1,137 @@
+import os
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+
+# shared memory channel between the runner and a strategy, used when the runner is started with `local --shm`.
+# self-contained so it can be copied next to a strategy, game/shm_channel.py builds the runner side from it
+#
+#     channel = connect()
+#     config = json.loads(channel.read())
+#     while True:
+#         state = json.loads(channel.read())
+#         channel.write(json.dumps(command).encode())
+#
+# the segment holds LAYOUT (capacities of both rings) and two single-producer single-consumer rings:
+# the config and states go from the runner to the strategy, commands come back.
+# a ring is a RING header (the read counter) followed by its data, a message is <FRAME size><payload>
+# and may wrap around the end of the data.
+# the memory itself never tells that a message is there: the producer notifies a Signal after every message
+# and the consumer reads only as many messages as the signal has counted. The write and read syscalls
+# of the signal are the memory barriers that make the payload visible, nothing polls the segment.
+ENV_VARIABLE = 'STRATEGY_SHM_CHANNEL'
+LAYOUT = struct.Struct('<QQ56x')  # states capacity, commands capacity
+RING = struct.Struct('<Q56x')  # read counter
+FRAME = struct.Struct('<I')
+EVENT = (1).to_bytes(8, 'little')
+SIGNAL_READ_SIZE = 4096
+
+
+class Ring:
+    # the producer keeps its write position to itself and the consumer publishes how far it has read.
+    # the consumer calls release() only after a syscall that followed its copies, so the producer
+    # never overwrites bytes still being read; a stale read counter only shows less free space
+    def __init__(self, buffer: memoryview, offset: int, capacity: int):
+        self.buffer = buffer
+        self.header = offset
+        self.data = offset + RING.size
+        self.capacity = capacity
+        self.write_position = 0
+        self.read_position = 0
+
+    def copy_in(self, position: int, data: bytes):
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.buffer[self.data + start:self.data + start + first] = data[:first]
+        if first < len(data):
+            self.buffer[self.data:self.data + len(data) - first] = data[first:]
+
+    def copy_out(self, position: int, size: int) -> bytes:
+        start = position % self.capacity
+        first = min(size, self.capacity - start)
+        data = self.buffer[self.data + start:self.data + start + first].tobytes()
+        if first < size:
+            data += self.buffer[self.data:self.data + size - first].tobytes()
+        return data
+
+    def write(self, message: bytes) -> bool:
+        (read_counter,) = RING.unpack_from(self.buffer, self.header)
+        if FRAME.size + len(message) > self.capacity - (self.write_position - read_counter):
+            return False
+
+        self.copy_in(self.write_position, FRAME.pack(len(message)))
+        self.copy_in(self.write_position + FRAME.size, message)
+        self.write_position += FRAME.size + len(message)
+        return True
+
+    def read(self) -> bytes:
+        # only for a message the signal has counted
+        (size,) = FRAME.unpack(self.copy_out(self.read_position, FRAME.size))
+        message = self.copy_out(self.read_position + FRAME.size, size)
+        self.read_position += FRAME.size + size
+        return message
+
+    def release(self):
+        RING.pack_into(self.buffer, self.header, self.read_position)
+
+
+class Signal:
+    # eventfd, or a pipe where there is none; one notify per message, wait returns how many came
+    def __init__(self, wait_fd: int, notify_fd: int, counter: bool):
+        self.wait_fd = wait_fd
+        self.notify_fd = notify_fd
+        self.counter = counter
+
+    def notify(self):
+        os.write(self.notify_fd, EVENT if self.counter else b'\0')
+
+    def wait(self) -> int:
+        # blocks unless wait_fd is non-blocking, then raises BlockingIOError when nothing came
+        data = os.read(self.wait_fd, SIGNAL_READ_SIZE)
+        if not data:
+            raise ConnectionError('Signal is closed')
+        return int.from_bytes(data, 'little') if self.counter else len(data)
+
+
+def make_signal() -> Signal:
+    if hasattr(os, 'eventfd'):
+        fd = os.eventfd(0)
+        return Signal(fd, fd, True)
+    wait_fd, notify_fd = os.pipe()
+    return Signal(wait_fd, notify_fd, False)
+
+
+class Channel:
+    def __init__(self, name: str, states_signal: Signal, commands_signal: Signal):
+        self.memory = shared_memory.SharedMemory(name=name)
+        # the runner owns the segment, the tracker of this process would unlink it on exit
+        resource_tracker.unregister(self.memory._name, 'shared_memory')
+        buffer = self.memory.buf
+        states_capacity, commands_capacity = LAYOUT.unpack_from(buffer)
+        self.states = Ring(buffer, LAYOUT.size, states_capacity)
+        self.commands = Ring(buffer, LAYOUT.size + RING.size + states_capacity, commands_capacity)
+        self.states_signal = states_signal
+        self.commands_signal = commands_signal
+        # messages counted by the signal and not read yet
+        self.pending = 0
+
+    def read(self) -> bytes:
+        # the config, then a state per request, JSON text or a binary state without the FRAME prefix
+        if not self.pending:
+            self.pending = self.states_signal.wait()
+            self.states.release()
+        self.pending -= 1
+        return self.states.read()
+
+    def write(self, command: bytes):
+        # JSON text or a binary command record
+        if not self.commands.write(command):
+            raise RuntimeError('Command does not fit into the commands ring')
+        self.commands_signal.notify()
+        self.states.release()
+
+
+def connect() -> Channel:
+    name, states_wait, commands_notify, counter = os.environ[ENV_VARIABLE].split(',')
+    counter = counter == 'eventfd'
+    return Channel(name, Signal(int(states_wait), None, counter), Signal(None, int(commands_notify), counter))
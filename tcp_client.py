@@ -1,61 +1,153 @@
 import argparse
+import errno
+import os
+import selectors
 import socket
 import subprocess
 import sys
 import atexit
 
 
+BUFFER_SIZE = 256 * 1024
+
+
+class Pump:
+    # moves bytes from one file descriptor to another as they come, without looking at them.
+    # on Linux os.splice moves them in the kernel, otherwise they are copied through a reusable buffer
+    def __init__(self, src: int, dst: int, use_splice: bool, pending: bytes = b''):
+        self.src = src
+        self.dst = dst
+        self.use_splice = use_splice and hasattr(os, 'splice')
+        self.buffer = bytearray(max(BUFFER_SIZE, len(pending)))
+        self.view = memoryview(self.buffer)
+        self.buffer[:len(pending)] = pending
+        self.start = 0
+        self.end = len(pending)
+        # splice found the destination full, so nothing can be moved until it is writable
+        self.blocked = False
+
+    def waits_for(self) -> tuple[int, int]:
+        if self.blocked or self.start < self.end:
+            return self.dst, selectors.EVENT_WRITE
+        return self.src, selectors.EVENT_READ
+
+    def on_ready(self) -> bool:
+        # returns False when the source is closed
+        if self.blocked:
+            self.blocked = False
+            return True
+
+        if self.start < self.end:
+            self.flush()
+            return True
+
+        if self.use_splice:
+            try:
+                size = os.splice(self.src, self.dst, BUFFER_SIZE, flags=os.SPLICE_F_NONBLOCK)
+            except BlockingIOError:
+                self.blocked = True
+                return True
+            except OSError as e:
+                if e.errno != errno.EINVAL:
+                    raise
+                # the pair of descriptors can't be spliced
+                self.use_splice = False
+                return True
+            return size != 0
+
+        try:
+            size = os.readv(self.src, [self.view])
+        except BlockingIOError:
+            return True
+        if size == 0:
+            return False
+
+        self.start, self.end = 0, size
+        self.flush()
+        return True
+
+    def flush(self):
+        try:
+            self.start += os.write(self.dst, self.view[self.start:self.end])
+        except BlockingIOError:
+            pass
+
+
 class TCPClient:
-    def __init__(self, host, port, strategy):
+    def __init__(self, host, port, strategy, use_splice=True):
         # connect to server
         self.conn = socket.create_connection((host, port))
-        self.buffer = b''
+        self.conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.strategy = strategy
+        self.use_splice = use_splice
         self.process = None
 
         atexit.register(self.on_exit)
 
-    def write_to_process(self, msg):
-        self.process.stdin.write(msg)
-        self.process.stdin.flush()
-
-    def read_message(self):
-        while True:
-            batch = self.conn.recv(1024)
-            if batch:
-                self.buffer += batch
-                eol_index = self.buffer.rfind(b'\n')
-                if eol_index != -1:
-                    eol_index += 1
-                    break
-            else:
+    def read_first_message(self) -> bytes:
+        # everything received up to the end of the config, it may already hold a part of the first state
+        received = bytearray()
+        while b'\n' not in received:
+            batch = self.conn.recv(BUFFER_SIZE)
+            if not batch:
                 sys.exit()
+            received += batch
 
-        msg = self.buffer[:eol_index]
-        self.buffer = self.buffer[eol_index:]
-
-        return msg
+        return bytes(received)
 
     def run(self):
         # receive config
-        config = self.read_message()
+        received = self.read_first_message()
 
         # start strategy after all clients are connected and first message received
         self.process = subprocess.Popen(self.strategy, shell=True, stdin=subprocess.PIPE,
                                         stdout=subprocess.PIPE)
-        self.write_to_process(config)
 
-        # game loop
-        while True:
-            # receive state
-            self.write_to_process(self.read_message())
+        # after the config both directions are plain byte streams, the strategy and the server do the framing
+        conn_fd = self.conn.fileno()
+        stdin_fd = self.process.stdin.fileno()
+        stdout_fd = self.process.stdout.fileno()
+        for fd in (conn_fd, stdin_fd, stdout_fd):
+            os.set_blocking(fd, False)
+
+        pumps = [
+            Pump(conn_fd, stdin_fd, self.use_splice, received),
+            Pump(stdout_fd, conn_fd, self.use_splice),
+        ]
+
+        selector = selectors.DefaultSelector()
+        waits = None
+        try:
+            while True:
+                # registrations only change when a pump switches between reading and writing
+                current = [pump.waits_for() for pump in pumps]
+                if current != waits:
+                    waits = current
+                    events = {}
+                    for fd, event in waits:
+                        events[fd] = events.get(fd, 0) | event
+                    for key in list(selector.get_map().values()):
+                        if key.fd not in events:
+                            selector.unregister(key.fd)
+                        elif key.events != events[key.fd]:
+                            selector.modify(key.fd, events.pop(key.fd))
+                        else:
+                            del events[key.fd]
+                    for fd, event in events.items():
+                        selector.register(fd, event)
 
-            # send command
-            command = self.process.stdout.readline()
-            self.conn.send(command)
+                for key, mask in selector.select():
+                    for pump, (fd, event) in zip(pumps, waits):
+                        if fd == key.fd and mask & event and not pump.on_ready():
+                            return
+        except (BrokenPipeError, ConnectionError):
+            pass
+        finally:
+            selector.close()
 
     def on_exit(self):
-        self.process.kill()
+        if self.process is not None:
+            self.process.kill()
         self.conn.close()
 
 
@@ -64,7 +156,8 @@ if __name__ == '__main__':
     parser.add_argument('--host', type=str)
     parser.add_argument('--port', type=str)
     parser.add_argument('--strategy', type=str)
+    parser.add_argument('--no-splice', action='store_true', help='Copy data in user space instead of os.splice')
 
     args = parser.parse_args()
-    client = TCPClient(args.host, args.port, args.strategy)
+    client = TCPClient(args.host, args.port, args.strategy, use_splice=not args.no_splice)
     client.run()
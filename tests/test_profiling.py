@@ -0,0 +1,35 @@
+import io
+import json
+
+from benchmarks.bots import ScriptedBot
+from benchmarks.suite import make_config
+from game.game import Game
+from game.profiling import TickProfiler
+from parsing import parse_command
+
+SEED = 3
+TICKS = 3000
+
+
+def play(profiler: TickProfiler = None) -> Game:
+    game_config = make_config(players=4, chainsaws=4, shot_timeout=2)
+    game = Game(game_config, seed=SEED, profiler=profiler)
+    bots = [ScriptedBot(SEED + spawn.id, game_config.arena.width, game_config.arena.height, 0.5)
+            for spawn in game_config.players.spawns]
+    for _ in range(TICKS):
+        if game.is_ended():
+            break
+        game.tick([parse_command(game, player.id, bot.command()) for player, bot in zip(game.players, bots)])
+    return game
+
+
+def test_profiled_game_ends_in_same_state():
+    output = io.StringIO()
+    profiler = TickProfiler(phases=True, sample_period=500, tick_budget_ns=0, output=output)
+    plain = play()
+    profiled = play(profiler)
+
+    assert json.dumps(profiled.get_state()) == json.dumps(plain.get_state())
+    assert profiler.ticks == plain.ticks
+    assert profiler.calls['chainsaw_logic'] == profiler.ticks
+    assert 'other=' in output.getvalue()
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from game.shm_channel import Channel, ChannelFull
+from strategies.shm_channel import LAYOUT, RING, Ring, Signal
+
+
+def strategy_side(channel: Channel) -> tuple[Ring, Ring]:
+    # rings of strategies/shm_channel.py Channel over the same segment, without attaching in this process
+    buffer = channel.memory.buf
+    states_capacity, commands_capacity = LAYOUT.unpack_from(buffer)
+    states = Ring(buffer, LAYOUT.size, states_capacity)
+    commands = Ring(buffer, LAYOUT.size + RING.size + states_capacity, commands_capacity)
+    return states, commands
+
+
+def test_messages_wrap_around_the_rings():
+    channel = Channel(100, 64)
+    try:
+        states, commands = strategy_side(channel)
+        states_wait = Signal(channel.states_signal.wait_fd, None, channel.states_signal.counter)
+        commands_notify = Signal(None, channel.commands_signal.notify_fd, channel.commands_signal.counter)
+        rng = random.Random(1)
+        for index in range(1000):
+            state = rng.randbytes(rng.randint(0, 40))
+            channel.send(state)
+            assert states_wait.wait() == 1
+            states.release()
+            assert states.read() == state
+
+            command = str(index).encode()
+            assert commands.write(command)
+            commands_notify.notify()
+            states.release()
+            channel.collect_signals()
+            assert channel.receive() == command
+            assert channel.receive() is None
+    finally:
+        channel.close()
+
+
+def test_unreleased_messages_are_not_overwritten():
+    channel = Channel(32, 64)
+    try:
+        states, _ = strategy_side(channel)
+        channel.send(bytes(20))
+        states_wait = Signal(channel.states_signal.wait_fd, None, channel.states_signal.counter)
+        assert states_wait.wait() == 1
+        assert states.read() == bytes(20)
+        # read but not released yet, the producer still sees the space as taken
+        with pytest.raises(ChannelFull):
+            channel.send(bytes(20))
+        states.release()
+        channel.send(bytes(20))
+    finally:
+        channel.close()
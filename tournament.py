@@ -0,0 +1,137 @@
+import asyncio
+import itertools
+import random
+from multiprocessing import util
+
+from game.game import Game
+from game.game_loop import GameLoop
+from game.replay import ReplayWriter
+from game.telemetry import Telemetry
+from clients import InProcessClient, ProcessClient, ProcessPool, get_process_clients, load_strategy, reap_process
+from config import GameConfig
+
+
+PAIRINGS = ('round-robin', 'random')
+
+# warm strategy processes of a worker process outlive matches, and so does the event loop they belong to
+worker_loop = None
+worker_pool = None
+
+
+def make_pairings(pool: list[str], players_count: int, matches: int, scheme: str, seed=None) -> list[list[str]]:
+    if scheme == 'round-robin':
+        # pool entries are distinct by position so the same strategy may be listed twice for self-play
+        combinations = list(itertools.combinations(range(len(pool)), players_count))
+        indices = [combinations[match % len(combinations)] for match in range(matches)]
+    elif scheme == 'random':
+        rng = random.Random(seed)
+        indices = [rng.sample(range(len(pool)), players_count) for _ in range(matches)]
+    else:
+        raise ValueError(f'Unknown pairing scheme {scheme}')
+
+    return [[pool[index] for index in match_indices] for match_indices in indices]
+
+
+def close_worker_pool():
+    # terminates and reaps the idle strategies on the loop they were started on
+    worker_loop.run_until_complete(worker_pool.close())
+
+
+def get_worker_pool(game_config: GameConfig, reuse_processes: int):
+    global worker_loop, worker_pool
+    if worker_pool is None:
+        worker_loop = asyncio.new_event_loop()
+        worker_pool = ProcessPool(game_config, reuse_processes)
+        # executor workers leave through os._exit, so atexit handlers would not terminate the strategies
+        util.Finalize(worker_pool, close_worker_pool, exitpriority=10)
+
+    return worker_loop, worker_pool
+
+
+async def play_match_async(game_config: GameConfig, strategies: list[str], in_process: bool, bullet_pool: bool,
+                           replay_path: str = None, swept_collisions: bool = False, pool: ProcessPool = None,
+                           telemetry_path: str = None):
+    game = Game(game_config, bullet_pool=bullet_pool, swept_collisions=swept_collisions)
+
+    if in_process:
+        clients = [InProcessClient(load_strategy(strategy)) for strategy in strategies]
+    elif pool is not None:
+        clients = await asyncio.gather(*(pool.acquire(strategy) for strategy in strategies))
+    else:
+        clients = await get_process_clients(strategies, game_config)
+
+    strategy_by_client = {id(client): strategy for client, strategy in zip(clients, strategies)}
+    replay = ReplayWriter(replay_path, game_config.raw_config) if replay_path else None
+    telemetry = Telemetry(telemetry_path) if telemetry_path else None
+    game_loop = GameLoop(game, clients, replay, telemetry=telemetry)
+    players = [
+        (strategy_by_client[id(client)], client_id)
+        for client_id, client in game_loop.clients.items()
+    ]
+
+    try:
+        await game_loop.play()
+    finally:
+        if pool is not None:
+            connected = {id(client) for client in game_loop.clients.values()}
+            for client in clients:
+                await pool.release(strategy_by_client[id(client)], client, id(client) in connected)
+        else:
+            for client_id in list(game_loop.clients):
+                game_loop.disconnect_client(client_id)
+
+            # reap strategy processes before the match event loop is closed
+            for client in clients:
+                if isinstance(client, ProcessClient):
+                    await reap_process(client.process)
+
+    return [(strategy, game.get_player_by_id(player_id).score) for strategy, player_id in players]
+
+
+def play_match(match_id: int, raw_config: dict, strategies: list[str], in_process: bool, bullet_pool: bool,
+               replay_path: str = None, swept_collisions: bool = False, reuse_processes: int = 1,
+               telemetry_path: str = None):
+    # the raw config is sent to the worker process and every match builds its own Game/GameLoop from it
+    game_config = GameConfig(**raw_config)
+    if in_process or reuse_processes <= 1:
+        return match_id, asyncio.run(play_match_async(game_config, strategies, in_process, bullet_pool, replay_path,
+                                                      swept_collisions, telemetry_path=telemetry_path))
+
+    loop, pool = get_worker_pool(game_config, reuse_processes)
+    return match_id, loop.run_until_complete(play_match_async(game_config, strategies, in_process, bullet_pool,
+                                                              replay_path, swept_collisions, pool, telemetry_path))
+
+
+class Leaderboard:
+    def __init__(self):
+        self.entries = {}
+
+    def add_match(self, results: list[tuple[str, int]]):
+        # results has one (strategy, score) per player slot, the same strategy may fill several of them
+        best_score = max(score for _, score in results)
+        winning_slots = [slot for slot, (_, score) in enumerate(results) if score == best_score]
+        # shared first place is not a win
+        winner = results[winning_slots[0]][0] if len(winning_slots) == 1 else None
+
+        for strategy in dict.fromkeys(strategy for strategy, _ in results):
+            entry = self.entries.setdefault(strategy, {'matches': 0, 'wins': 0, 'score': 0, 'players': 0})
+            entry['matches'] += 1
+            if strategy == winner:
+                entry['wins'] += 1
+
+        for strategy, score in results:
+            entry = self.entries[strategy]
+            entry['score'] += score
+            entry['players'] += 1
+
+    def rows(self) -> list[tuple[str, dict]]:
+        return sorted(self.entries.items(), key=lambda item: (item[1]['wins'], item[1]['score']), reverse=True)
+
+    def format(self) -> str:
+        lines = [f'{"strategy":<40} {"matches":>8} {"wins":>6} {"score":>10} {"avg":>10}']
+        for strategy, entry in self.rows():
+            # per player, so self-play matches don't double it
+            average = entry['score'] / entry['players']
+            lines.append(f'{strategy:<40} {entry["matches"]:>8} {entry["wins"]:>6} {entry["score"]:>10} {average:>10.1f}')
+
+        return '\n'.join(lines)